@@ -0,0 +1,99 @@
+"""
+Benchmark of the task and fleet aggregation: the per-container accumulators of the
+collection loop against ContainerSamples with Python loops and with NumPy, at 10, 100 and
+1000 containers. The fleet aggregation groups the containers by task family, ten
+containers per family. By default, ContainerSamples uses NumPy from
+columnar.VECTORIZE_MIN_ROWS rows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_columnar
+"""
+
+import timeit
+
+from benchmarks.synthetic_task import make_task
+from scripts import columnar
+from scripts.collector import SUMMED_GAUGES, summarize_task
+from scripts.columnar import ContainerSamples
+
+CONTAINER_COUNTS = (10, 100, 1000)
+COLUMNS = SUMMED_GAUGES + ("started_at",)
+
+
+def accumulate(rows):
+    """
+    Aggregates the rows one container at a time, like the sum_of_* accumulators.
+    """
+    result = {}
+    for group, values in rows:
+        aggregates = result.setdefault(group, dict.fromkeys(COLUMNS, 0))
+        for name, value in zip(SUMMED_GAUGES, values):
+            aggregates[name] += value
+        aggregates["started_at"] = max(aggregates["started_at"], values[-1])
+    return result
+
+
+def aggregate(rows, vectorized):
+    """
+    Aggregates the rows with ContainerSamples.
+    """
+    samples = ContainerSamples(COLUMNS, vectorized=vectorized)
+    for group, values in rows:
+        samples.append(group, values)
+    return samples.aggregate(SUMMED_GAUGES, ("started_at",))
+
+
+def task_rows(containers):
+    """
+    Returns the rows of one synthetic task, grouped as one task and by family of ten.
+    """
+    task, stats = make_task(0, containers)
+    summary = summarize_task(task, stats)
+    rows = [
+        [container["gauges"].get(name, 0) for name in SUMMED_GAUGES] + [container["started_at"]]
+        for container in summary["containers"]
+    ]
+    return (
+        [(None, row) for row in rows],
+        [(f"family-{i // 10}", row) for i, row in enumerate(rows)],
+    )
+
+
+def best_us(function, number):
+    """
+    Returns the best time of a call in microseconds.
+    """
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    methods = {"accumulators": accumulate}
+    methods["columnar loop"] = lambda rows: aggregate(rows, False)
+    if columnar.get_numpy() is not None:
+        methods["columnar numpy"] = lambda rows: aggregate(rows, True)
+    else:
+        print("NumPy is not installed, only the loops are measured")
+
+    print(f"{'containers':>10} {'level':<6} " + " ".join(f"{name:>16}" for name in methods))
+    for containers in CONTAINER_COUNTS:
+        number = max(1, 20000 // containers)
+        for level, rows in zip(("task", "fleet"), task_rows(containers)):
+            expected = accumulate(rows)
+            results = []
+            for method in methods.values():
+                assert method(rows) == expected
+                results.append(
+                    best_us(lambda method=method, rows=rows: method(rows), number)
+                )
+            print(
+                f"{containers:>10} {level:<6} "
+                + " ".join(f"{result:13.1f} us" for result in results)
+            )
+
+
+if __name__ == "__main__":
+    main()
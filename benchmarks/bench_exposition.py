@@ -0,0 +1,62 @@
+"""
+Benchmark of the /metrics exposition formats: the CPU time and size of rendering a
+collected synthetic task in the classic text format, with generate_latest and with the
+series tracker, in OpenMetrics and in the delimited protobuf format, at 10, 100 and 1000
+containers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_exposition
+"""
+
+import time
+
+from prometheus_client import generate_latest
+
+from benchmarks.synthetic_task import make_task
+from scripts import collector
+from scripts.exposition import generate
+from scripts.series_delta import SeriesTracker
+
+CONTAINER_COUNTS = (10, 100, 1000)
+
+
+def best_cpu_us(function, number):
+    """
+    Returns the best CPU time of a call in microseconds.
+    """
+    results = []
+    for _ in range(5):
+        start = time.process_time()
+        for _ in range(number):
+            function()
+        results.append((time.process_time() - start) / number * 1e6)
+    return min(results)
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    formats = {
+        "text": generate_latest,
+        "text tracker": lambda registry: SeriesTracker().snapshot(registry)[0],
+        "openmetrics": lambda registry: generate(registry, "openmetrics")[0],
+        "protobuf": lambda registry: generate(registry, "protobuf")[0],
+    }
+    print(f"{'containers':>10} {'format':<13} {'cpu':>12} {'bytes':>10}")
+    for containers in CONTAINER_COUNTS:
+        collector.get_counter_offsets.cache_clear()
+        documents = make_task(0, containers)
+        registry = collector.collect_ecs_task_registry(lambda documents=documents: documents)
+        number = max(1, 2000 // containers)
+        for name, render in formats.items():
+            size = len(render(registry))
+            cpu = best_cpu_us(
+                lambda render=render, registry=registry: render(registry), number
+            )
+            print(f"{containers:>10} {name:<13} {cpu:9.1f} us {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark of the decode and compute stage of a collection, summarize_task(), on synthetic
+multi-task payloads: throughput in the calling process against process pools of growing
+size. The pool only speeds up the stage when the host has as many cores available.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_process_pool
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic_task import make_task_bytes
+from scripts.collector import summarize_task
+
+TASKS = 64
+CONTAINERS = 20
+ROUNDS = 5
+
+
+def pool_sizes():
+    """
+    Returns the pool sizes to measure, powers of two up to the number of cores.
+    """
+    cores = os.cpu_count() or 1
+    sizes = [1]
+    while sizes[-1] * 2 <= cores:
+        sizes.append(sizes[-1] * 2)
+    if sizes[-1] != cores:
+        sizes.append(cores)
+    return sizes
+
+
+def measure(summarize_all):
+    """
+    Returns the best throughput in tasks per second over ROUNDS runs.
+    """
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        summarize_all()
+        best = min(best, time.perf_counter() - start)
+    return TASKS / best
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    payloads = [make_task_bytes(index, CONTAINERS) for index in range(TASKS)]
+    tasks = [task for task, _ in payloads]
+    stats = [stat for _, stat in payloads]
+
+    print(f"{TASKS} tasks of {CONTAINERS} containers, {os.cpu_count()} cores")
+    inline = measure(lambda: [summarize_task(*payload) for payload in payloads])
+    print(f"{'inline':<12} {inline:10.0f} tasks/s")
+    for size in pool_sizes():
+        with ProcessPoolExecutor(size, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Start the processes before measuring
+            list(pool.map(summarize_task, tasks[:size], stats[:size]))
+            throughput = measure(
+                lambda pool=pool, size=size: list(
+                    pool.map(summarize_task, tasks, stats, chunksize=max(1, TASKS // (size * 4)))
+                )
+            )
+        print(f"{f'pool {size}':<12} {throughput:10.0f} tasks/s {throughput / inline:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
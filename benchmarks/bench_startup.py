@@ -0,0 +1,92 @@
+"""
+Benchmark of the server runtimes: time from process start to the first successful scrape,
+and resident memory after a number of scrapes.
+
+Compares the FastAPI application started by uvicorn.run(app) with the lean server.
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.mock_server import mock_server
+
+EXPORTER_PORT = 9547
+SCRAPES = 200
+RUNS = 3
+RUNTIMES = {
+    "uvicorn.run(app)": "scripts.ecs_metrics_exporter",
+    "lean_server": "scripts.lean_server",
+}
+
+
+def scrape():
+    """
+    Scrapes /metrics once.
+    """
+    url = f"http://127.0.0.1:{EXPORTER_PORT}/metrics"
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+def rss_kib(pid):
+    """
+    Returns the resident set size of a process in KiB.
+    """
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(module, metadata_url):
+    """
+    Starts a runtime and returns (seconds to first scrape, RSS KiB after SCRAPES scrapes).
+    """
+    env = {
+        **os.environ,
+        "ECS_CONTAINER_METADATA_URI_V4": metadata_url,
+        "ECS_METRICS_EXPORTER_PORT": str(EXPORTER_PORT),
+    }
+    start = time.perf_counter()
+    with subprocess.Popen(
+        [sys.executable, "-m", module], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    ) as process:
+        try:
+            while True:
+                try:
+                    scrape()
+                    break
+                except OSError:
+                    time.sleep(0.005)
+            first_scrape = time.perf_counter() - start
+            for _ in range(SCRAPES):
+                scrape()
+            return first_scrape, rss_kib(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    with mock_server() as url:
+        print(f"{'runtime':<20} {'first scrape':>14} {'RSS':>12}")
+        for name, module in RUNTIMES.items():
+            results = [measure(module, url) for _ in range(RUNS)]
+            first_scrape = min(result[0] for result in results)
+            rss = max(result[1] for result in results)
+            print(f"{name:<20} {first_scrape * 1000:11.0f} ms {rss / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the stats sources: /task/stats over HTTP against the cgroup filesystem reader.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stats_sources
+"""
+
+import os
+import tempfile
+import timeit
+
+import requests
+
+from benchmarks.mock_server import mock_server
+from scripts.cgroup_reader import CgroupStatsReader
+from tests.fake_cgroup import SAMPLE_VALUES
+from tests.fake_cgroup import write_proc, write_v1_container, write_v2_container
+from tests.mock_endpoint import test_json
+
+ITERATIONS = 500
+
+
+def fetch_http_stats(session, url):
+    """
+    Fetches /task/stats from the mock metadata endpoint.
+    """
+    return session.get(f"{url}/task/stats", timeout=5).json()
+
+
+def report(name, seconds):
+    """
+    Prints the time per read.
+    """
+    print(f"{name:<24} {seconds / ITERATIONS * 1e6:10.1f} us/read")
+
+
+def main():
+    """
+    Runs the benchmark.
+    """
+    containers = test_json["task"]["Containers"]
+    with mock_server() as url:
+        with requests.Session() as session:
+            fetch_http_stats(session, url)
+            report("http /task/stats", timeit.timeit(
+                lambda: fetch_http_stats(session, url), number=ITERATIONS
+            ))
+
+        for version, write_container in (("v1", write_v1_container), ("v2", write_v2_container)):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                cgroup_root = os.path.join(tmpdir, "cgroup")
+                proc_root = os.path.join(tmpdir, "proc")
+                for pid, container in enumerate(containers, start=100):
+                    write_container(cgroup_root, container["DockerId"], pid, SAMPLE_VALUES)
+                    write_proc(proc_root, pid, 1000, 2000)
+                reader = CgroupStatsReader(cgroup_root, proc_root)
+                reader.read_stats(containers)
+                report(f"cgroup {version}", timeit.timeit(
+                    lambda reader=reader: reader.read_stats(containers), number=ITERATIONS
+                ))
+                reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+The mock metadata endpoint served in a separate process for the benchmarks.
+"""
+
+import contextlib
+import time
+from multiprocessing import Process
+
+import uvicorn
+
+from tests.mock_endpoint import app as mock_app
+
+MOCK_PORT = 5001
+
+
+def run_mock_server():
+    """
+    Run the mock metadata endpoint in a separate process.
+    """
+    uvicorn.run(mock_app, host="127.0.0.1", port=MOCK_PORT, log_level="warning")
+
+
+@contextlib.contextmanager
+def mock_server():
+    """
+    Serves the mock metadata endpoint while the context is active.
+
+    :return: The base URL of the endpoint.
+    """
+    server = Process(target=run_mock_server)
+    server.start()
+    time.sleep(1)
+    try:
+        yield f"http://127.0.0.1:{MOCK_PORT}"
+    finally:
+        server.terminate()
+        server.join()
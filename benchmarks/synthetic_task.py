@@ -0,0 +1,47 @@
+"""
+Synthetic task metadata and statistics for the benchmarks, built from the mock endpoint
+documents with any number of containers.
+"""
+
+import copy
+import json
+
+from tests.mock_endpoint import test_json
+
+
+def make_task(index, containers):
+    """
+    Builds a task with the given number of containers.
+
+    :param index: The task number, which makes the task and container identifiers unique.
+    :param containers: The number of containers.
+    :return: A tuple of the decoded (task_metadata, task_stats).
+    """
+    template_container = test_json["task"]["Containers"][0]
+    template_stat = next(iter(test_json["stats"].values()))
+    task = copy.deepcopy(test_json["task"])
+    task["Family"] = f"family-{index}"
+    task["Containers"] = []
+    stats = {}
+    for i in range(containers):
+        docker_id = f"{index:016x}{i:016x}-{i}"
+        container = copy.deepcopy(template_container)
+        container["DockerId"] = docker_id
+        container["Name"] = container["DockerName"] = f"container-{i}"
+        task["Containers"].append(container)
+
+        stat = copy.deepcopy(template_stat)
+        stat["id"] = docker_id
+        stat["name"] = f"container-{i}"
+        stat["cpu_stats"]["cpu_usage"]["total_usage"] += i * 1000003
+        stat["memory_stats"]["usage"] += i * 4096
+        stats[docker_id] = stat
+    return task, stats
+
+
+def make_task_bytes(index, containers):
+    """
+    Builds a task like make_task() as the JSON bytes served by the metadata endpoint.
+    """
+    task, stats = make_task(index, containers)
+    return json.dumps(task).encode("utf-8"), json.dumps(stats).encode("utf-8")
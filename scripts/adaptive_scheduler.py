@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+adaptive_scheduler - scrape-aware timing of background collections
+
+A fixed collection interval spends CPU on small tasks whether the snapshot is scraped or
+not. AdaptiveScheduler times the collections of the multi-worker mode from the scrapes
+it is told about:
+
+- It learns the scrape cadence as the median of the recent intervals between scrapes, and
+  starts each collection just before an expected scrape, leading it by the smoothed
+  duration of a collection.
+- Without scrapes for IDLE_AFTER_SCRAPES cadences, it collects once per idle interval.
+  The first scrape after an idle period triggers a collection right away.
+- While the counters stay the same and the gauges within CHANGE_TOLERANCE of the previous
+  collection, it doubles the number of expected scrapes per collection, up to the idle
+  interval. A change collects before every expected scrape again. A relative tolerance
+  would hide the increases of a large cumulative counter, so any counter change counts.
+
+Times are time.monotonic() values, which are comparable between the processes of a host.
+"""
+
+import math
+import statistics
+from collections import deque
+
+# Scrapes closer than this to the previous one, such as those of a redundant Prometheus
+# pair, count as one
+SCRAPE_MERGE_WINDOW = 1.0
+# Collections start this much earlier than the collection duration requires
+LEAD_MARGIN = 0.1
+MIN_COLLECT_GAP = 1.0
+IDLE_AFTER_SCRAPES = 3
+CHANGE_TOLERANCE = 0.01
+DURATION_SMOOTHING = 0.3
+SCRAPE_HISTORY = 8
+
+
+def sample_values(registry):
+    """
+    Returns the sample values of a registry that tell whether the collected values change.
+
+    The _created samples and the ecs_metrics_exporter_ metrics of the exporter itself are
+    left out, since they change with every collection.
+
+    :param registry: The CollectorRegistry of a collection.
+    :return: A dictionary of (sample name, sorted label pairs) to value.
+    """
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for metric in registry.collect()
+        for sample in metric.samples
+        if not sample.name.endswith("_created")
+        and not sample.name.startswith("ecs_metrics_exporter_")
+    }
+
+
+class AdaptiveScheduler:  # pylint: disable=too-many-instance-attributes
+    """
+    Decides when the next background collection starts.
+    """
+
+    def __init__(self, interval, idle_interval):
+        """
+        :param interval: The collection interval in seconds until the scrape cadence is
+            learned.
+        :param idle_interval: The collection interval in seconds when nothing scrapes,
+            and the longest interval between collections. Scrape intervals longer than
+            this are not learned, the idle interval serving such scrapers.
+        """
+        self.interval = interval
+        self.idle_interval = max(idle_interval, interval)
+        self.stride = 1
+        self.duration = None
+        self.last_scrape = None
+        self.last_collect = None
+        self._gaps = deque(maxlen=SCRAPE_HISTORY)
+        self._values = None
+        self._wake = False
+
+    @property
+    def cadence(self):
+        """
+        The learned interval between scrapes in seconds, or None before two scrapes.
+        """
+        return statistics.median(self._gaps) if self._gaps else None
+
+    def idle(self, now):
+        """
+        Returns whether no scrape is expected anymore.
+
+        :param now: The current time.
+        """
+        if self.last_scrape is None:
+            return True
+        return now - self.last_scrape > IDLE_AFTER_SCRAPES * (self.cadence or self.interval)
+
+    def record_scrape(self, when):
+        """
+        Records a scrape of the collected snapshot.
+
+        :param when: The time of the scrape.
+        """
+        if self.last_scrape is not None:
+            gap = when - self.last_scrape
+            if gap < SCRAPE_MERGE_WINDOW:
+                return
+            if gap <= self.idle_interval:
+                self._gaps.append(gap)
+        self._wake = self._wake or self.idle(when)
+        self.last_scrape = when
+
+    def record_collect(self, started, finished, values=None):
+        """
+        Records a collection.
+
+        :param started: The time the collection started.
+        :param finished: The time the collection finished.
+        :param values: The sample_values() of the collection, or None if it failed.
+        """
+        duration = finished - started
+        if self.duration is None:
+            self.duration = duration
+        else:
+            self.duration += DURATION_SMOOTHING * (duration - self.duration)
+        self.last_collect = finished
+        self._wake = False
+
+        if self._changed(values):
+            self.stride = 1
+        else:
+            self.stride = min(self.stride * 2, self._max_stride())
+        self._values = values
+
+    def _changed(self, values):
+        """
+        Returns whether collected values differ from those of the previous collection.
+        """
+        previous = self._values
+        if values is None or previous is None or len(values) != len(previous):
+            return True
+        for key, value in values.items():
+            old = previous.get(key)
+            if old is None:
+                return True
+            # Counter samples are named <name>_total
+            if key[0].endswith("_total"):
+                if value != old:
+                    return True
+            elif not math.isclose(value, old, rel_tol=CHANGE_TOLERANCE):
+                return True
+        return False
+
+    def _max_stride(self):
+        """
+        Returns the number of scrape intervals that fits the idle interval.
+        """
+        return max(1, int(self.idle_interval // (self.cadence or self.interval)))
+
+    def next_collect(self, now):
+        """
+        Returns the time the next collection should start, which may be in the past.
+
+        :param now: The current time.
+        """
+        if self.last_collect is None or self._wake:
+            return now
+        if self.idle(now):
+            return self.last_collect + self.idle_interval
+        stride = min(self.stride, self._max_stride())
+        cadence = self.cadence
+        if cadence is None:
+            return self.last_collect + self.interval * stride
+
+        # The first expected scrape that a collection starting after the last one can
+        # finish before, then stride - 1 scrapes later
+        lead = self.duration + LEAD_MARGIN
+        scrapes = max(1, math.floor((self.last_collect + lead - self.last_scrape) / cadence) + 1)
+        target = self.last_scrape + (scrapes + stride - 1) * cadence - lead
+        return max(target, self.last_collect + MIN_COLLECT_GAP)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+cgroup_reader - reads container statistics directly from the cgroup filesystem
+
+When the cgroup hierarchy of the task is visible to the exporter (for example the host
+/sys/fs/cgroup is mounted into the container), the accounting files can be read directly
+instead of asking the ECS agent for /task/stats on every scrape.
+
+Both cgroup v1 (cpuacct, memory, blkio controllers) and cgroup v2 (unified hierarchy)
+are supported. The values are returned in the same shape as the Docker stats API, so the
+exporter can map them to the same metric families as the Task metadata endpoint.
+"""
+
+import os
+import logging
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 65536
+# The hierarchy is walked again for a container not found in it after this many seconds
+MISSING_RETRY_INTERVAL = 60.0
+
+V1_CPU_CONTROLLERS = ("cpu,cpuacct", "cpuacct,cpu", "cpuacct")
+V1_BLKIO_BYTES_FILES = (
+    "blkio.throttle.io_service_bytes_recursive",
+    "blkio.throttle.io_service_bytes",
+)
+V1_BLKIO_OPS_FILES = (
+    "blkio.throttle.io_serviced_recursive",
+    "blkio.throttle.io_serviced",
+)
+
+
+def parse_flat_keyed(content):
+    """
+    Parses a flat keyed cgroup file such as memory.stat or cpu.stat.
+
+    :param content: The file content.
+    :return: A dictionary of key to integer value.
+    """
+    values = {}
+    for line in content.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            values[fields[0]] = int(fields[1])
+    return values
+
+
+def parse_v1_blkio(content):
+    """
+    Parses a cgroup v1 blkio file ("major:minor Op value" per line).
+
+    :param content: The file content.
+    :return: A list of entries in the Docker stats API blkio format.
+    """
+    entries = []
+    for line in content.splitlines():
+        fields = line.split()
+        if len(fields) != 3:
+            continue
+        major, minor = fields[0].split(":")
+        entries.append(
+            {"major": int(major), "minor": int(minor), "op": fields[1], "value": int(fields[2])}
+        )
+    return entries
+
+
+def parse_v2_io_stat(content):
+    """
+    Parses a cgroup v2 io.stat file ("major:minor rbytes=.. wbytes=.. rios=.. wios=..").
+
+    :param content: The file content.
+    :return: A tuple of (io_service_bytes, io_serviced) in the Docker stats API blkio format.
+    """
+    service_bytes = []
+    serviced = []
+    for line in content.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        major, minor = fields[0].split(":")
+        counters = dict(field.split("=", 1) for field in fields[1:])
+        device = {"major": int(major), "minor": int(minor)}
+        service_bytes.append({**device, "op": "Read", "value": int(counters.get("rbytes", 0))})
+        service_bytes.append({**device, "op": "Write", "value": int(counters.get("wbytes", 0))})
+        serviced.append({**device, "op": "Read", "value": int(counters.get("rios", 0))})
+        serviced.append({**device, "op": "Write", "value": int(counters.get("wios", 0))})
+    return service_bytes, serviced
+
+
+def parse_net_dev(content):
+    """
+    Parses /proc/<pid>/net/dev, skipping the loopback interface.
+
+    :param content: The file content.
+    :return: A dictionary of interface name to its rx_bytes and tx_bytes.
+    """
+    networks = {}
+    for line in content.splitlines()[2:]:
+        interface, _, counters = line.partition(":")
+        interface = interface.strip()
+        fields = counters.split()
+        if interface == "lo" or len(fields) < 9:
+            continue
+        networks[interface] = {"rx_bytes": int(fields[0]), "tx_bytes": int(fields[8])}
+    return networks
+
+
+def find_container_dir(base, docker_id):
+    """
+    Finds the cgroup directory of a container below a hierarchy root.
+
+    :param base: The hierarchy root to search.
+    :param docker_id: The full Docker container ID.
+    :return: The directory path, or None if it is not visible.
+    """
+    for dirpath, dirnames, _ in os.walk(base):
+        for dirname in dirnames:
+            if docker_id in dirname:
+                return os.path.join(dirpath, dirname)
+    return None
+
+
+class CgroupStatsReader:
+    """
+    Reads container statistics from cgroup accounting files.
+
+    The container directories are located once per DockerId and the file descriptors
+    of every accounting file are kept open, so each read is a single pread(2) call.
+    A container that is not found is looked for again after MISSING_RETRY_INTERVAL, and
+    one whose cgroup disappears is forgotten. The network counters are read through the
+    first process of a container, whose file is replaced when that process changes.
+    """
+
+    def __init__(self, cgroup_root="/sys/fs/cgroup", proc_root="/proc"):
+        self.cgroup_root = cgroup_root
+        self.proc_root = proc_root
+        self.unified = os.path.exists(os.path.join(cgroup_root, "cgroup.controllers"))
+        self._fds = {}
+        self._container_dirs = {}
+        self._missing = {}
+        self._net_dev_paths = {}
+
+    def close(self):
+        """
+        Closes all the cached file descriptors.
+        """
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        self._container_dirs.clear()
+        self._missing.clear()
+        self._net_dev_paths.clear()
+
+    def forget(self, docker_id):
+        """
+        Drops the cached directories of a container and closes the file descriptors in them
+        and that of its network counters.
+
+        :param docker_id: The full Docker container ID.
+        """
+        for key in [key for key in self._container_dirs if key[0] == docker_id]:
+            container_dir = self._container_dirs.pop(key) + os.sep
+            for path in [path for path in self._fds if path.startswith(container_dir)]:
+                self._close(path)
+        for key in [key for key in self._missing if key[0] == docker_id]:
+            del self._missing[key]
+        net_dev_path = self._net_dev_paths.pop(docker_id, None)
+        if net_dev_path is not None:
+            self._close(net_dev_path)
+
+    def _close(self, path):
+        """
+        Closes the cached file descriptor of a path, if any.
+        """
+        fd = self._fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _read(self, path):
+        """
+        Reads the whole content of a file, reusing its file descriptor across reads.
+
+        :param path: The file path.
+        :return: The file content as a string.
+        """
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            self._fds[path] = fd
+        try:
+            chunks = []
+            offset = 0
+            while True:
+                chunk = os.pread(fd, READ_CHUNK_SIZE, offset)
+                chunks.append(chunk)
+                offset += len(chunk)
+                if len(chunk) < READ_CHUNK_SIZE:
+                    break
+        except OSError:
+            self._close(path)
+            raise
+        return b"".join(chunks).decode("ascii")
+
+    def _read_first(self, directory, names):
+        """
+        Reads the first existing file among candidate names in a directory.
+
+        :param directory: The directory containing the files.
+        :param names: The candidate file names, in order of preference.
+        :return: The file content as a string.
+        """
+        for name in names[:-1]:
+            path = os.path.join(directory, name)
+            if path in self._fds or os.path.exists(path):
+                return self._read(path)
+        return self._read(os.path.join(directory, names[-1]))
+
+    def _container_dir(self, docker_id, controller=""):
+        """
+        Returns the cached cgroup directory of a container for a controller.
+
+        :param docker_id: The full Docker container ID.
+        :param controller: The v1 controller name, or "" for the unified hierarchy.
+        :return: The directory path, or None if it is not visible.
+        """
+        key = (docker_id, controller)
+        container_dir = self._container_dirs.get(key)
+        if container_dir is None:
+            missed_at = self._missing.get(key)
+            if missed_at is not None and time.monotonic() - missed_at < MISSING_RETRY_INTERVAL:
+                return None
+            container_dir = find_container_dir(
+                os.path.join(self.cgroup_root, controller), docker_id
+            )
+            if container_dir is None:
+                self._missing[key] = time.monotonic()
+            else:
+                self._container_dirs[key] = container_dir
+                self._missing.pop(key, None)
+        return container_dir
+
+    def _read_networks(self, docker_id, procs_dir):
+        """
+        Reads the network counters of the network namespace of a container.
+
+        :param docker_id: The full Docker container ID.
+        :param procs_dir: The cgroup directory containing cgroup.procs.
+        :return: A dictionary in the Docker stats API networks format.
+        """
+        pids = self._read(os.path.join(procs_dir, "cgroup.procs")).split()
+        if not pids:
+            return {}
+        path = os.path.join(self.proc_root, pids[0], "net", "dev")
+        previous = self._net_dev_paths.get(docker_id)
+        if previous != path:
+            # The first process changed, e.g. after a restart in place
+            if previous is not None:
+                self._close(previous)
+            self._net_dev_paths[docker_id] = path
+        try:
+            return parse_net_dev(self._read(path))
+        except FileNotFoundError:
+            return {}
+
+    def _read_v1(self, docker_id):
+        """
+        Reads the statistics of a container from the cgroup v1 controllers.
+
+        :param docker_id: The full Docker container ID.
+        :return: A partial Docker stats API dictionary, or None if it is not visible.
+        """
+        cpu_dir = None
+        for controller in V1_CPU_CONTROLLERS:
+            if os.path.isdir(os.path.join(self.cgroup_root, controller)):
+                cpu_dir = self._container_dir(docker_id, controller)
+                break
+        memory_dir = self._container_dir(docker_id, "memory")
+        blkio_dir = self._container_dir(docker_id, "blkio")
+        if cpu_dir is None or memory_dir is None or blkio_dir is None:
+            return None
+
+        return {
+            "cpu_stats": {
+                "cpu_usage": {
+                    "total_usage": int(self._read(os.path.join(cpu_dir, "cpuacct.usage")))
+                }
+            },
+            "memory_stats": {
+                "usage": int(self._read(os.path.join(memory_dir, "memory.usage_in_bytes"))),
+                "stats": parse_flat_keyed(self._read(os.path.join(memory_dir, "memory.stat"))),
+            },
+            "blkio_stats": {
+                "io_service_bytes_recursive": parse_v1_blkio(
+                    self._read_first(blkio_dir, V1_BLKIO_BYTES_FILES)
+                ),
+                "io_serviced_recursive": parse_v1_blkio(
+                    self._read_first(blkio_dir, V1_BLKIO_OPS_FILES)
+                ),
+            },
+            "networks": self._read_networks(docker_id, memory_dir),
+        }
+
+    def _read_v2(self, docker_id):
+        """
+        Reads the statistics of a container from the cgroup v2 unified hierarchy.
+
+        :param docker_id: The full Docker container ID.
+        :return: A partial Docker stats API dictionary, or None if it is not visible.
+        """
+        container_dir = self._container_dir(docker_id)
+        if container_dir is None:
+            return None
+
+        cpu_stat = parse_flat_keyed(self._read(os.path.join(container_dir, "cpu.stat")))
+        service_bytes, serviced = parse_v2_io_stat(
+            self._read(os.path.join(container_dir, "io.stat"))
+        )
+        return {
+            "cpu_stats": {"cpu_usage": {"total_usage": cpu_stat["usage_usec"] * 1000}},
+            "memory_stats": {
+                "usage": int(self._read(os.path.join(container_dir, "memory.current"))),
+                "stats": parse_flat_keyed(self._read(os.path.join(container_dir, "memory.stat"))),
+            },
+            "blkio_stats": {
+                "io_service_bytes_recursive": service_bytes,
+                "io_serviced_recursive": serviced,
+            },
+            "networks": self._read_networks(docker_id, container_dir),
+        }
+
+    def read_stats(self, containers):
+        """
+        Reads the statistics of the given task containers.
+
+        Containers whose cgroup directory is not visible or cannot be read, such as
+        containers that exited, are skipped.
+
+        :param containers: The "Containers" list of the task metadata.
+        :return: A dictionary of DockerId to stats, shaped like /task/stats.
+        """
+        read_time = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        stats = {}
+        for container in containers:
+            docker_id = container["DockerId"]
+            try:
+                if self.unified:
+                    container_stat = self._read_v2(docker_id)
+                else:
+                    container_stat = self._read_v1(docker_id)
+            except OSError as e:
+                logger.debug("cgroup of container %s cannot be read: %s", docker_id, e)
+                self.forget(docker_id)
+                continue
+            if container_stat is None:
+                logger.debug("cgroup of container %s is not visible", docker_id)
+                continue
+            container_stat["id"] = docker_id
+            container_stat["name"] = container.get("DockerName", container["Name"])
+            container_stat["read"] = read_time
+            stats[docker_id] = container_stat
+        return stats
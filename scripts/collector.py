@@ -0,0 +1,696 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+collector - collects ECS Task Metadata v4 values into Prometheus metrics
+
+This module holds the collection shared by the server runtimes. It only imports the
+standard library and prometheus_client, so a runtime that does not need FastAPI,
+pydantic, Starlette or uvicorn can use it without importing them.
+"""
+
+import os
+import http.client
+import json
+import logging
+import multiprocessing
+import re
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import lru_cache, partial
+
+from prometheus_client import Counter, Gauge, generate_latest
+from prometheus_client.core import CollectorRegistry
+
+from scripts.cgroup_reader import CgroupStatsReader
+from scripts.columnar import ContainerSamples
+from scripts.docker_engine import DEFAULT_DOCKER_SOCKET, DockerStatsStreamer
+from scripts.counter_state import CounterOffsets
+from scripts.exposition import TEXT_TYPE, generate, negotiate, transform_samples
+from scripts.series_delta import SeriesTracker
+
+METADATA_URL_ENV = "ECS_CONTAINER_METADATA_URI_V4"
+STATS_SOURCE_ENV = "ECS_METRICS_EXPORTER_STATS_SOURCE"
+CGROUP_ROOT_ENV = "ECS_METRICS_EXPORTER_CGROUP_ROOT"
+PROC_ROOT_ENV = "ECS_METRICS_EXPORTER_PROC_ROOT"
+DOCKER_SOCKET_ENV = "ECS_METRICS_EXPORTER_DOCKER_SOCKET"
+STATE_FILE_ENV = "ECS_METRICS_EXPORTER_STATE_FILE"
+PROCESS_POOL_SIZE_ENV = "ECS_METRICS_EXPORTER_PROCESS_POOL_SIZE"
+SAMPLE_TIMESTAMPS_ENV = "ECS_METRICS_EXPORTER_SAMPLE_TIMESTAMPS"
+GENERATION_HEADER = "X-Metrics-Generation"
+DELTA_HEADER = "X-Metrics-Delta"
+EXCESS_FRACTION_DIGITS = re.compile(r"(\.\d{6})\d+")
+SUMMED_GAUGES = (
+    "gauge_mem_usage_total_bytes",
+    "gauge_mem_usage_total_bytes_without_cache",
+    "gauge_network_io_rx_bytes",
+    "gauge_network_io_tx_bytes",
+    "gauge_block_io_read_bytes",
+    "gauge_block_io_write_bytes",
+    "gauge_block_io_read_ops",
+    "gauge_block_io_write_ops",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def create_metrics(registry):
+    """
+    Creates and returns a dictionary of Prometheus metrics for ECS containers and tasks.
+
+    Args:
+        registry: The Prometheus registry to which the metrics will be registered.
+
+    Returns:
+        dict: A dictionary containing Prometheus Counter and Gauge metrics with the following keys:
+            - "counter_cpu_usage_sec": Counter for total CPU usage in seconds.
+            - "gauge_mem_usage_total_bytes": Gauge for total memory usage in bytes (including cache).
+            - "gauge_mem_usage_total_bytes_without_cache": Gauge for memory usage in bytes (excluding cache).
+            - "gauge_network_io_rx_bytes": Gauge for network I/O received bytes.
+            - "gauge_network_io_tx_bytes": Gauge for network I/O transmitted bytes.
+            - "gauge_block_io_read_bytes": Gauge for block I/O read bytes.
+            - "gauge_block_io_write_bytes": Gauge for block I/O write bytes.
+            - "gauge_block_io_read_ops": Gauge for block I/O read operations.
+            - "gauge_block_io_write_ops": Gauge for block I/O write operations.
+            - "gauge_pull_started_at_time": Gauge for task pull start time in epoch.
+            - "gauge_pull_stopped_at_time": Gauge for task pull stop time in epoch.
+            - "gauge_container_last_started_at_time": Gauge for the last container start time in epoch.
+            - "gauge_task_cpu_limit": Gauge for task CPU limit.
+            - "gauge_task_memory_limit_byte": Gauge for task memory limit in bytes.
+            - "ecs_metrics_exporter_success": Gauge indicating if the ECS metrics exporter succeeded
+              (0 for failure, 1 for success).
+            - "counter_exporter_cpu_sec": Counter for the CPU seconds used by the exporter process.
+    """
+
+    labels = ["container_name", "container_id", "task_family", "task_revision"]
+    return {
+        "counter_cpu_usage_sec": Counter(
+            "ee_container_cpu_usage_seconds_total",
+            "cpu_stats->cpu_usage->total_usage convert nano sec to sec",
+            labels,
+            registry=registry,
+        ),
+        "gauge_mem_usage_total_bytes": Gauge(
+            "ee_container_memory_usage_byte",
+            "memory_stats->usage with cache",
+            labels,
+            registry=registry,
+        ),
+        "gauge_mem_usage_total_bytes_without_cache": Gauge(
+            "ee_container_memory_usage_without_cache_byte",
+            "memory_stats->usage - memory_stats->cache",
+            labels,
+            registry=registry,
+        ),
+        "gauge_network_io_rx_bytes": Gauge(
+            "ee_container_network_io_rx_bytes",
+            "network_io_rx_bytes",
+            labels,
+            registry=registry,
+        ),
+        "gauge_network_io_tx_bytes": Gauge(
+            "ee_container_network_io_tx_bytes",
+            "network_io_tx_bytes",
+            labels,
+            registry=registry,
+        ),
+        "gauge_block_io_read_bytes": Gauge(
+            "ee_container_block_io_read_bytes",
+            "block_io_read_bytes",
+            labels,
+            registry=registry,
+        ),
+        "gauge_block_io_write_bytes": Gauge(
+            "ee_container_block_io_write_bytes",
+            "block_io_write_bytes",
+            labels,
+            registry=registry,
+        ),
+        "gauge_block_io_read_ops": Gauge(
+            "ee_container_block_io_read_ops",
+            "block_io_read_ops",
+            labels,
+            registry=registry,
+        ),
+        "gauge_block_io_write_ops": Gauge(
+            "ee_container_block_io_write_ops",
+            "block_io_write_ops",
+            labels,
+            registry=registry,
+        ),
+        "gauge_pull_started_at_time": Gauge(
+            "ee_task_pull_started_at_time",
+            "tasks PullStartedAt epoch",
+            labels,
+            registry=registry,
+        ),
+        "gauge_pull_stopped_at_time": Gauge(
+            "ee_task_pull_stopped_at_time",
+            "tasks PullStoppedAt epoch",
+            labels,
+            registry=registry,
+        ),
+        "gauge_container_last_started_at_time": Gauge(
+            "ee_container_last_started_at_time",
+            "epoch that maximum StartedAt in all containers",
+            labels,
+            registry=registry,
+        ),
+        "gauge_task_cpu_limit": Gauge(
+            "ee_task_cpu_limit",
+            "task cpu limit (ex. 0.5, 1.0..)",
+            labels,
+            registry=registry,
+        ),
+        "gauge_task_memory_limit_byte": Gauge(
+            "ee_task_memory_limit_byte",
+            "task memory limit bytes",
+            labels,
+            registry=registry,
+        ),
+        "ecs_metrics_exporter_success": Gauge(
+            "ecs_metrics_exporter_success",
+            "Indicates if the ECS metrics exporter succeeded. 0 for failure, 1 for success.",
+            registry=registry,
+        ),
+        "counter_exporter_cpu_sec": Counter(
+            "ecs_metrics_exporter_cpu_seconds_total",
+            "CPU seconds used by the exporter process, by user and system mode",
+            ["mode"],
+            registry=registry,
+        ),
+    }
+
+
+def get_short_container_id(container_id_full):
+    """
+    Extracts and returns the short form of the container ID.
+
+    :param container_id_full: The full container ID.
+    :return: The short container ID (first 12 characters).
+    """
+    return container_id_full[:12]
+
+
+@lru_cache(maxsize=None)
+def get_cgroup_reader(cgroup_root, proc_root):
+    """
+    Returns the shared cgroup reader for the given roots, so file handles are reused.
+
+    :param cgroup_root: The cgroup filesystem mount point.
+    :param proc_root: The proc filesystem mount point.
+    :return: A CgroupStatsReader instance.
+    """
+    return CgroupStatsReader(cgroup_root, proc_root)
+
+
+@lru_cache(maxsize=None)
+def get_counter_offsets(state_file):
+    """
+    Returns the shared counter offsets for the given state file.
+
+    :param state_file: The memory-mapped state file path, or None to keep them in memory.
+    :return: A CounterOffsets instance.
+    """
+    return CounterOffsets(state_file)
+
+
+@lru_cache(maxsize=None)
+def get_docker_streamer(socket_path):
+    """
+    Returns the shared Docker stats streamer for the given socket, so streams outlive scrapes.
+
+    :param socket_path: The Docker Engine API unix socket path.
+    :return: A DockerStatsStreamer instance.
+    """
+    return DockerStatsStreamer(socket_path)
+
+
+@lru_cache(maxsize=None)
+def get_process_pool(size):
+    """
+    Returns the process pool running summarize_task(), or None when it is disabled.
+
+    :param size: The number of processes, 0 to summarize in the collecting thread.
+    :return: The ProcessPoolExecutor or None.
+    """
+    if size <= 0:
+        return None
+    return ProcessPoolExecutor(size, mp_context=multiprocessing.get_context("spawn"))
+
+
+def fetch_bytes(url, description):
+    """
+    Fetches a document from the ECS metadata endpoint without decoding it.
+
+    :param url: The URL to fetch.
+    :param description: What is fetched, for the error message.
+    :return: The response body.
+    :raises urllib.error.URLError: When the request fails, its status is not successful
+        or its body is cut off.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        raise urllib.error.URLError(
+            f"Failed to fetch {description} with status code {e.code}"
+        ) from e
+    except http.client.HTTPException as e:
+        raise urllib.error.URLError(f"Failed to fetch {description}: {e!r}") from e
+
+
+def fetch_json(url, description):
+    """
+    Fetches and decodes a JSON document from the ECS metadata endpoint.
+
+    :param url: The URL to fetch.
+    :param description: What is fetched, for the error message.
+    :return: The decoded JSON document.
+    :raises urllib.error.URLError: When fetching fails or the body is not JSON.
+    """
+    body = fetch_bytes(url, description)
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise urllib.error.URLError(f"Failed to decode {description}: {e}") from e
+
+
+def fetch_task(decode=True):
+    """
+    Fetches and decodes the task metadata from the ECS metadata endpoint.
+
+    :param decode: Whether to decode the document, or return the JSON bytes.
+    :return: The task metadata.
+    """
+    metadata_url = os.getenv(METADATA_URL_ENV)
+    task_url = f"{metadata_url}/task"
+    if not decode:
+        return fetch_bytes(task_url, "task metadata")
+    return fetch_json(task_url, "task metadata")
+
+
+def fetch_task_stats(task=None, decode=True):
+    """
+    Fetches and decodes the task statistics from the configured stats source.
+
+    When ECS_METRICS_EXPORTER_STATS_SOURCE is "cgroup", the statistics are read from
+    the cgroup filesystem, and when it is "docker", they are the latest samples of the
+    Docker Engine API stats streams, instead of the /task/stats endpoint.
+
+    :param task: The task metadata, fetched when needed by the stats source and not given.
+    :param decode: Whether to decode the /task/stats document, or return the JSON bytes.
+        The other stats sources always return decoded statistics.
+    :return: The task statistics.
+    """
+    stats_source = os.getenv(STATS_SOURCE_ENV, "metadata")
+    if stats_source == "cgroup":
+        reader = get_cgroup_reader(
+            os.getenv(CGROUP_ROOT_ENV, "/sys/fs/cgroup"), os.getenv(PROC_ROOT_ENV, "/proc")
+        )
+        return reader.read_stats((task or fetch_task()).get("Containers", []))
+    if stats_source == "docker":
+        streamer = get_docker_streamer(os.getenv(DOCKER_SOCKET_ENV, DEFAULT_DOCKER_SOCKET))
+        return streamer.read_stats((task or fetch_task()).get("Containers", []))
+
+    metadata_url = os.getenv(METADATA_URL_ENV)
+    stats_url = f"{metadata_url}/task/stats"
+    if not decode:
+        return fetch_bytes(stats_url, "stats metadata")
+    return fetch_json(stats_url, "stats metadata")
+
+
+def fetch_task_metadata(decode=True):
+    """
+    Fetches and decodes the task metadata and statistics.
+
+    :param decode: Whether to decode the documents fetched from the metadata endpoint, or
+        return them as JSON bytes for summarize_task() to decode.
+    :return: A tuple of (task_metadata, task_stats).
+    """
+    if os.getenv(STATS_SOURCE_ENV, "metadata") != "metadata":
+        task = fetch_task()
+    else:
+        task = fetch_task(decode)
+    return task, fetch_task_stats(task, decode)
+
+
+series_tracker = SeriesTracker()
+
+
+def str2timestamp(time_str):
+    """
+    Converts a time string with potential nanoseconds into an epoch timestamp with
+    microseconds.
+
+    ISO 8601 strings are parsed with the standard library, and dateutil is only
+    imported for other formats.
+
+    :param time_str: The time string, possibly including nanoseconds.
+    :return: The epoch timestamp in seconds as a float.
+    """
+    try:
+        dt = datetime.fromisoformat(
+            EXCESS_FRACTION_DIGITS.sub(r"\1", time_str).replace("Z", "+00:00")
+        )
+    except ValueError:
+        from dateutil import parser  # pylint: disable=import-outside-toplevel
+
+        dt = parser.parse(time_str)
+    return dt.timestamp()
+
+
+def str2epoch(time_str):
+    """
+    Converts a time string with potential nanoseconds into an epoch timestamp.
+
+    :param time_str: The time string, possibly including nanoseconds.
+    :return: The epoch timestamp as an integer.
+    """
+    return int(str2timestamp(time_str))
+
+
+def container_gauges(container_stat):
+    """
+    Computes the gauge values of a container from its statistics.
+
+    :param container_stat: The decoded statistics of the container.
+    :return: A tuple of (gauge values of the container, its contributions to the task sums).
+    """
+    gauges = {}
+
+    # Memory usage
+    mem_usage_bytes = container_stat["memory_stats"]["usage"]
+    gauges["gauge_mem_usage_total_bytes"] = mem_usage_bytes
+    gauges["gauge_mem_usage_total_bytes_without_cache"] = (
+        mem_usage_bytes - container_stat["memory_stats"]["stats"].get("cache", 0)
+    )
+
+    # Network IO
+    # Containers in the host or container: network modes have no networks statistics
+    networks = container_stat.get("networks") or {}
+    gauges["gauge_network_io_rx_bytes"] = sum(
+        interface["rx_bytes"] for interface in networks.values()
+    )
+    gauges["gauge_network_io_tx_bytes"] = sum(
+        interface["tx_bytes"] for interface in networks.values()
+    )
+    totals = dict.fromkeys(SUMMED_GAUGES, 0)
+    totals.update(gauges)
+
+    # Block IO
+    # The gauge keeps the last device while the task sums all of them
+    # On cgroup v2 hosts, the Docker Engine reports null io_serviced_recursive and lowercase ops
+    for key, read_name, write_name in (
+        ("io_service_bytes_recursive", "gauge_block_io_read_bytes", "gauge_block_io_write_bytes"),
+        ("io_serviced_recursive", "gauge_block_io_read_ops", "gauge_block_io_write_ops"),
+    ):
+        for blk_io in container_stat["blkio_stats"].get(key) or []:
+            op = blk_io["op"].lower()
+            if op == "read":
+                gauges[read_name] = blk_io["value"]
+                totals[read_name] += blk_io["value"]
+            elif op == "write":
+                gauges[write_name] = blk_io["value"]
+                totals[write_name] += blk_io["value"]
+    return gauges, totals
+
+
+def summarize_task(task, stats):
+    """
+    Decodes the task metadata and statistics and computes the values of the metrics.
+
+    This is the CPU-bound part of a collection. It only returns plain values, so it can
+    run in a process of the pool returned by get_process_pool().
+
+    :param task: The task metadata, decoded or as JSON bytes.
+    :param stats: The task statistics, decoded or as JSON bytes.
+    :return: A dictionary of the task values, the "containers" values, and the "sums" of
+        the container gauges for the task.
+    """
+    if isinstance(task, (bytes, str)):
+        task = json.loads(task)
+    if isinstance(stats, (bytes, str)):
+        stats = json.loads(stats)
+
+    task_containers_info = {ci["DockerId"]: ci for ci in task.get("Containers", [])}
+
+    summary = {
+        # Task info
+        "task_family": task["Family"],
+        "task_revision": task["Revision"],
+        # Task pull times
+        "pull_started_at": str2epoch(task["PullStartedAt"]) if "PullStartedAt" in task else 0,
+        "pull_stopped_at": str2epoch(task["PullStoppedAt"]) if "PullStoppedAt" in task else 0,
+        # Task limits
+        "cpu_limit": float(task["Limits"]["CPU"]),
+        "memory_limit_bytes": int(task["Limits"]["Memory"]) * 1024 * 1024,
+        "containers": [],
+    }
+    # One row per container, aggregated for the task once all are read
+    samples = ContainerSamples(SUMMED_GAUGES + ("started_at",))
+
+    # Process each container in the task
+    for container_stat in stats.values():
+        # Container start time
+        started_at = str2epoch(task_containers_info[container_stat["id"]]["StartedAt"])
+        gauges, totals = container_gauges(container_stat)
+
+        samples.append(None, [totals[name] for name in SUMMED_GAUGES] + [started_at])
+        summary["containers"].append({
+            "name": container_stat["name"],
+            "id": container_stat["id"],
+            "started_at": started_at,
+            "cpu_usage_sec": container_stat["cpu_stats"]["cpu_usage"]["total_usage"] / 1e9,
+            "read": (
+                str2timestamp(container_stat["read"]) if container_stat.get("read") else None
+            ),
+            "gauges": gauges,
+        })
+
+    aggregates = samples.aggregate(SUMMED_GAUGES, ("started_at",)).get(None, {})
+    summary["sums"] = {name: aggregates.get(name, 0) for name in SUMMED_GAUGES}
+    summary["last_started_at"] = aggregates.get("started_at", 0)
+    return summary
+
+
+def summarize(task, stats, pool):
+    """
+    Runs summarize_task() on the process pool, or in the calling thread without one.
+
+    :param task: The task metadata, decoded or as JSON bytes.
+    :param stats: The task statistics, decoded or as JSON bytes.
+    :param pool: The ProcessPoolExecutor or None.
+    :return: The summary of summarize_task().
+    """
+    if pool is None:
+        return summarize_task(task, stats)
+    try:
+        return pool.submit(summarize_task, task, stats).result()
+    except BrokenProcessPool:
+        logger.error("The process pool is broken, starting a new one")
+        get_process_pool.cache_clear()
+        pool = get_process_pool(int(os.getenv(PROCESS_POOL_SIZE_ENV, "0")))
+        return pool.submit(summarize_task, task, stats).result()
+
+
+def count_exporter_cpu(counter):
+    """
+    Counts the CPU time used by the exporter process so far, its overhead on the task.
+
+    The time of pool processes and multi-worker serving processes is not included.
+
+    :param counter: The ecs_metrics_exporter_cpu_seconds_total Counter of a collection.
+    """
+    cpu_times = os.times()
+    counter.labels(mode="user").inc(cpu_times.user)
+    counter.labels(mode="system").inc(cpu_times.system)
+
+
+def collect_ecs_task_registry(fetch=None):
+    """
+    Collects metrics from ECS task metadata and updates the Prometheus metrics.
+
+    This function fetches task metadata, computes various metrics based on the metadata,
+    and updates the Prometheus metrics accordingly. The metadata are fetched in the calling
+    thread, while decoding and computing run on the process pool when
+    ECS_METRICS_EXPORTER_PROCESS_POOL_SIZE is set.
+
+    :param fetch: A callable returning (task_metadata, task_stats), decoded or as JSON
+        bytes, fetch_task_metadata by default.
+    :return: The CollectorRegistry holding the metrics.
+    """
+    registry = CollectorRegistry(auto_describe=False)
+    metrics = create_metrics(registry)
+    counter_offsets = get_counter_offsets(os.getenv(STATE_FILE_ENV))
+    pool = get_process_pool(int(os.getenv(PROCESS_POOL_SIZE_ENV, "0")))
+
+    count_exporter_cpu(metrics["counter_exporter_cpu_sec"])
+
+    try:
+        # Leave the decoding to the pool, which would otherwise receive pickled documents
+        if fetch is None:
+            fetch = partial(fetch_task_metadata, decode=pool is None)
+        summary = summarize(*fetch(), pool)
+
+        task_labels = {
+            "container_name": "_task_",
+            "container_id": "_task_",
+            "task_family": summary["task_family"],
+            "task_revision": summary["task_revision"],
+        }
+        metrics["gauge_pull_started_at_time"].labels(**task_labels).set(
+            summary["pull_started_at"]
+        )
+        metrics["gauge_pull_stopped_at_time"].labels(**task_labels).set(
+            summary["pull_stopped_at"]
+        )
+        metrics["gauge_task_cpu_limit"].labels(**task_labels).set(summary["cpu_limit"])
+        metrics["gauge_task_memory_limit_byte"].labels(**task_labels).set(
+            summary["memory_limit_bytes"]
+        )
+
+        sum_of_cpu_usage_sec = 0
+        read_times = {}
+        for container in summary["containers"]:
+            labels = {
+                "container_name": container["name"],
+                "container_id": get_short_container_id(container["id"]),
+                "task_family": summary["task_family"],
+                "task_revision": summary["task_revision"],
+            }
+            if container["read"] is not None and container["read"] > 0:
+                read_times[tuple(sorted(labels.items()))] = container["read"]
+
+            # CPU usage
+            # The counter is kept continuous across container and exporter restarts
+            cpu_usage_sec = counter_offsets.continuous(
+                "|".join((container["name"], summary["task_family"], summary["task_revision"])),
+                container["id"],
+                container["started_at"],
+                container["cpu_usage_sec"],
+            )
+            metrics["counter_cpu_usage_sec"].labels(**labels).inc(cpu_usage_sec)
+            sum_of_cpu_usage_sec += cpu_usage_sec
+
+            for name, value in container["gauges"].items():
+                metrics[name].labels(**labels).set(value)
+
+        metrics["counter_cpu_usage_sec"].labels(**task_labels).inc(
+            counter_offsets.monotonic("|".join(task_labels.values()), sum_of_cpu_usage_sec)
+        )
+        counter_offsets.flush()
+        for name, value in summary["sums"].items():
+            metrics[name].labels(**task_labels).set(value)
+
+        # Set the last started container time for the task
+        metrics["gauge_container_last_started_at_time"].labels(**task_labels).set(
+            summary["last_started_at"]
+        )
+        metrics["ecs_metrics_exporter_success"].set(1)
+    except (OSError, ValueError) as e:
+        # ValueError is a body that is not JSON, decoded by summarize_task() on the pool
+        logger.error("Failed to fetch some metrics: %s", e)
+        metrics["ecs_metrics_exporter_success"].set(0)
+        return registry
+
+    if os.getenv(SAMPLE_TIMESTAMPS_ENV, "false").lower() in ("1", "true", "yes") and read_times:
+        # The task totals are as recent as the latest container sample
+        read_times[tuple(sorted(task_labels.items()))] = max(read_times.values())
+        return with_read_timestamps(registry, metrics, read_times)
+    return registry
+
+
+def with_read_timestamps(registry, metrics, read_times):
+    """
+    Returns the registry with the statistics samples timestamped with their read time.
+
+    :param registry: The CollectorRegistry holding the collected metrics.
+    :param metrics: The metrics of create_metrics() in the registry.
+    :param read_times: A dictionary of sorted label pairs to the read time in seconds.
+    :return: The CollectorRegistry exposing the timestamped samples.
+    """
+    families = {
+        metrics[name].describe()[0].name for name in ("counter_cpu_usage_sec",) + SUMMED_GAUGES
+    }
+
+    def timestamp(metric, sample):
+        read_time = read_times.get(tuple(sorted(sample.labels.items())))
+        if metric.name not in families or read_time is None or sample.name.endswith("_created"):
+            return sample
+        return sample._replace(timestamp=read_time)
+
+    return transform_samples(registry, timestamp)
+
+
+def collect_ecs_task_metadata():
+    """
+    Collects metrics from ECS task metadata and renders them in the text format.
+
+    :return: The text exposition bytes.
+    """
+    return generate_latest(collect_ecs_task_registry())
+
+
+def without_created(registry):
+    """
+    Returns the registry without the _created samples of its counters.
+
+    The registry is rebuilt by every collection, so the created time of its counters is
+    the collection time, which would read as a counter reset on every scrape and as a
+    change of every counter in a delta.
+
+    :param registry: The CollectorRegistry holding the collected metrics.
+    :return: The CollectorRegistry exposing the other samples.
+    """
+    return transform_samples(
+        registry, lambda _, sample: None if sample.name.endswith("_created") else sample
+    )
+
+
+def render_metrics(accept=None, series_filter=None):
+    """
+    Collects metrics from ECS task metadata and renders them in the negotiated format.
+
+    Only the full text format keeps the _created samples, like generate_latest().
+
+    :param accept: The Accept header of the scrape, choosing between the text format,
+        OpenMetrics and the Prometheus protobuf format.
+    :param series_filter: An optional SeriesFilter restricting the rendered series.
+    :return: A tuple of (content bytes, content type).
+    """
+    registry = collect_ecs_task_registry()
+    exposition_format = negotiate(accept)
+    if exposition_format == "text" and series_filter is None:
+        return generate_latest(registry), TEXT_TYPE
+    registry = without_created(registry)
+    if exposition_format == "text":
+        # The series tracker caches the rendering of each selection
+        content, _ = series_tracker.snapshot(registry, series_filter=series_filter)
+        return content, TEXT_TYPE
+    if series_filter is not None:
+        registry = transform_samples(
+            registry,
+            lambda _, sample: sample if series_filter.selects(
+                sample.name, sample.name, tuple(sorted(sample.labels.items()))
+            ) else None,
+        )
+    return generate(registry, exposition_format)
+
+
+def render_delta(since, series_filter=None):
+    """
+    Collects metrics from ECS task metadata and renders the series changed since a
+    generation token in the text format, without the _created samples.
+
+    :param since: The generation token of the client, or None for all series.
+    :param series_filter: An optional SeriesFilter restricting the rendered series.
+    :return: A tuple of (text exposition bytes, generation token, whether only the
+        changed series were rendered), see SeriesTracker.delta().
+    """
+    return series_tracker.delta(
+        without_created(collect_ecs_task_registry()), since, series_filter
+    )
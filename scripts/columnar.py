@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+columnar - batch aggregation of container samples
+
+ContainerSamples keeps the samples of containers as columns, one row per container and
+one column per metric. The aggregates of groups of rows, such as the totals of a task or
+of a task family, are computed over whole columns with NumPy when it is installed and
+there are enough rows, and with Python loops otherwise. NumPy is only imported once a
+vectorized aggregation needs it, so the exporters do not pay for its import.
+
+Both give the same results as adding the values one container at a time: integer columns
+are summed with NumPy only when the sums cannot overflow 64 bits, and other columns are
+summed in row order with Python. Maxima do not depend on the order.
+"""
+
+from functools import lru_cache
+
+INT64_MAX = 2**63 - 1
+# Below this number of rows, converting the columns to arrays costs more than it saves
+VECTORIZE_MIN_ROWS = 500
+
+
+@lru_cache(maxsize=None)
+def get_numpy():
+    """
+    Returns the NumPy module, imported on the first call, or None when it is not installed.
+    """
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return numpy
+
+
+class ContainerSamples:
+    """
+    Container samples stored by column, aggregated by group.
+    """
+
+    def __init__(self, columns, vectorized=None):
+        """
+        :param columns: The column names.
+        :param vectorized: Whether to aggregate with NumPy, by default when it is installed
+            and there are at least VECTORIZE_MIN_ROWS rows.
+        """
+        self.columns = tuple(columns)
+        self.vectorized = vectorized
+        self._groups = []
+        self._values = {column: [] for column in self.columns}
+
+    def __len__(self):
+        return len(self._groups)
+
+    def append(self, group, values):
+        """
+        Appends the row of a container.
+
+        :param group: The group of the row, any hashable value such as the task family.
+        :param values: The values of the row, in the order of the columns.
+        """
+        self._groups.append(group)
+        for column, value in zip(self._values.values(), values):
+            column.append(value)
+
+    def aggregate(self, sum_columns=(), max_columns=()):
+        """
+        Computes the sums and maxima of columns per group.
+
+        Like the accumulators they replace, the sums and maxima start from 0.
+
+        :param sum_columns: The names of the columns to sum.
+        :param max_columns: The names of the columns to take the maximum of.
+        :return: A dictionary of group to a dictionary of column name to aggregate, with
+            the groups in the order of their first row.
+        """
+        codes = []
+        group_codes = {}
+        for group in self._groups:
+            codes.append(group_codes.setdefault(group, len(group_codes)))
+        vectorized = self.vectorized
+        if vectorized is None:
+            vectorized = len(codes) >= VECTORIZE_MIN_ROWS and get_numpy() is not None
+        if vectorized and codes:
+            columns = self._aggregate_arrays(codes, len(group_codes), sum_columns, max_columns)
+        else:
+            columns = {
+                **{name: self._sum_loop(name, codes, len(group_codes)) for name in sum_columns},
+                **{name: self._max_loop(name, codes, len(group_codes)) for name in max_columns},
+            }
+        return {
+            group: {name: values[code] for name, values in columns.items()}
+            for group, code in group_codes.items()
+        }
+
+    def _aggregate_arrays(self, codes, group_count, sum_columns, max_columns):
+        """
+        Computes the aggregates of aggregate() with NumPy.
+
+        :return: A dictionary of column name to the list of aggregates per group code.
+        """
+        np = get_numpy()
+        codes = np.asarray(codes)
+        order = np.argsort(codes, kind="stable")
+        starts = np.searchsorted(codes[order], np.arange(group_count))
+
+        columns = {}
+        for name in sum_columns:
+            values = np.asarray(self._values[name])
+            if values.dtype.kind in "iu" and (
+                max(-int(values.min()), int(values.max())) * len(values) <= INT64_MAX
+            ):
+                columns[name] = np.add.reduceat(values[order], starts).tolist()
+            else:
+                columns[name] = self._sum_loop(name, codes.tolist(), group_count)
+        for name in max_columns:
+            values = np.asarray(self._values[name])
+            if values.dtype.kind in "iuf":
+                columns[name] = [
+                    max(0, value) for value in np.maximum.reduceat(values[order], starts).tolist()
+                ]
+            else:
+                columns[name] = self._max_loop(name, codes.tolist(), group_count)
+        return columns
+
+    def _sum_loop(self, name, codes, group_count):
+        """
+        Sums a column per group code in row order.
+        """
+        sums = [0] * group_count
+        for code, value in zip(codes, self._values[name]):
+            sums[code] += value
+        return sums
+
+    def _max_loop(self, name, codes, group_count):
+        """
+        Takes the maximum of a column per group code.
+        """
+        maxima = [0] * group_count
+        for code, value in zip(codes, self._values[name]):
+            maxima[code] = max(maxima[code], value)
+        return maxima
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+counter_state - keeps container counters monotonic across restarts
+
+The Docker stats counters, such as cpu_stats->cpu_usage->total_usage, start from zero
+when a container is restarted. CounterOffsets remembers, per container of a task, the
+DockerId, the StartedAt time and the last value of the container. When the container
+changes or the value goes backwards, the last value is added to the offset, so the
+exported counter keeps increasing. Sums over containers, which go backwards when a
+container disappears, are kept monotonic on their own.
+
+Entries not used for EVICT_AFTER_FLUSHES flushes are forgotten. The offsets can be
+persisted to a small memory-mapped state file, so a restarted exporter resumes with
+continuous counters.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<Q")
+DEFAULT_STATE_FILE_SIZE = 65536
+EVICT_AFTER_FLUSHES = 10
+
+
+class CounterOffsets:
+    """
+    Per series offsets that make counters continuous across container resets.
+    """
+
+    def __init__(self, state_file=None, size=DEFAULT_STATE_FILE_SIZE):
+        """
+        :param state_file: The path of the memory-mapped state file, or None to keep
+            the offsets in memory only.
+        :param size: The size of the state file in bytes.
+        """
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._seen = set()
+        self._dirty = False
+        self._mmap = None
+        if state_file:
+            self._mmap = self._open(state_file, size)
+            self._entries = self._load()
+
+    @staticmethod
+    def _open(state_file, size):
+        """
+        Opens the state file, creating or growing it to the given size, and maps it.
+        """
+        fd = os.open(state_file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            return mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _load(self):
+        """
+        Reads the persisted offsets, ignoring an empty or corrupted state file.
+        """
+        (length,) = HEADER.unpack_from(self._mmap, 0)
+        if length == 0 or length > len(self._mmap) - HEADER.size:
+            return {}
+        try:
+            return json.loads(self._mmap[HEADER.size:HEADER.size + length])
+        except ValueError:
+            logger.warning("Ignoring corrupted counter state file")
+            return {}
+
+    def continuous(self, key, docker_id, started_at, value):
+        """
+        Returns the continuous value of a counter, detecting container resets.
+
+        :param key: A string identifying the container, e.g. its name joined with the task
+            family and revision, so a replacement container continues from it.
+        :param docker_id: The full Docker container ID.
+        :param started_at: The container StartedAt epoch.
+        :param value: The raw counter value reported for the container.
+        :return: The offset plus the raw value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"offset": 0.0}
+                self._entries[key] = entry
+            elif (
+                entry["docker_id"] != docker_id
+                or entry["started_at"] != started_at
+                or value < entry["last"]
+            ):
+                logger.info("Counter reset detected for %s", key)
+                entry["offset"] += entry["last"]
+            entry["docker_id"] = docker_id
+            entry["started_at"] = started_at
+            entry["last"] = value
+            self._seen.add(key)
+            self._dirty = True
+            return entry["offset"] + value
+
+    def monotonic(self, key, value):
+        """
+        Returns a sum of continuous counters that never goes backwards. When a member of
+        the sum disappears, the decrease is added to the offset.
+
+        :param key: A string identifying the sum.
+        :param value: The current sum.
+        :return: The offset plus the sum.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(key, {"offset": 0.0, "last": value})
+            if value < entry["last"]:
+                entry["offset"] += entry["last"] - value
+            entry["last"] = value
+            self._seen.add(key)
+            self._dirty = True
+            return entry["offset"] + value
+
+    def _evict(self):
+        """
+        Forgets the entries not used for EVICT_AFTER_FLUSHES flushes.
+        """
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if key in self._seen:
+                entry.pop("missed", None)
+            elif entry.get("missed", 0) + 1 >= EVICT_AFTER_FLUSHES:
+                del self._entries[key]
+            else:
+                entry["missed"] = entry.get("missed", 0) + 1
+        self._seen.clear()
+
+    def flush(self):
+        """
+        Forgets the entries not used since the recent flushes and writes the offsets to the
+        state file when they have changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            if self._mmap is None:
+                return
+            payload = json.dumps(self._entries, separators=(",", ":")).encode("utf-8")
+            if len(payload) > len(self._mmap) - HEADER.size:
+                logger.warning("Counter state does not fit in the state file, not persisted")
+                return
+            HEADER.pack_into(self._mmap, 0, 0)
+            self._mmap[HEADER.size:HEADER.size + len(payload)] = payload
+            HEADER.pack_into(self._mmap, 0, len(payload))
+            self._dirty = False
+
+    def close(self):
+        """
+        Flushes the offsets and unmaps the state file.
+        """
+        self.flush()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+docker_engine - streams container statistics from the Docker Engine API
+
+On ECS-on-EC2 hosts the Docker Engine API is reachable over /var/run/docker.sock.
+Instead of polling, one long-lived GET /containers/{id}/stats?stream=true request is kept
+open per container, and the latest sample is held in memory, so a scrape only reads it.
+Only the first scrape after a stream starts waits for its first sample. Streams that keep
+failing, such as those of stopped containers, are retried with an exponential backoff.
+
+The samples are the Docker stats API objects that the ECS agent also serves on
+/task/stats, so the exporter maps them to the same metric families.
+"""
+
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+RECONNECT_INTERVAL_SEC = 1.0
+MAX_RECONNECT_INTERVAL_SEC = 30.0
+STREAM_TIMEOUT_SEC = 30.0
+FIRST_SAMPLE_TIMEOUT_SEC = 2.0
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    HTTP connection over a unix domain socket.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class UnixConnectionPool:
+    """
+    Pool of keep-alive HTTP connections to a unix domain socket.
+    """
+
+    def __init__(self, socket_path, max_idle=8, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def acquire(self):
+        """
+        Returns an idle connection, or a new one when the pool is empty.
+
+        :return: A UnixHTTPConnection instance.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def release(self, conn):
+        """
+        Returns a connection whose response has been fully read to the pool.
+
+        :param conn: The connection to release.
+        """
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """
+        Closes all the idle connections.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class DockerStatsStreamer:  # pylint: disable=too-many-instance-attributes
+    """
+    Keeps the latest Docker stats sample of each container in memory.
+
+    A daemon thread per container consumes the stats stream and reconnects when it ends.
+    Streams of containers that are no longer part of the task are stopped.
+    """
+
+    def __init__(self, socket_path=DEFAULT_DOCKER_SOCKET,
+                 first_sample_timeout=FIRST_SAMPLE_TIMEOUT_SEC):
+        self.pool = UnixConnectionPool(socket_path, timeout=STREAM_TIMEOUT_SEC)
+        self.first_sample_timeout = first_sample_timeout
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._wanted = set()
+        self._threads = {}
+        self._first_sample = {}
+        self._latest = {}
+
+    def close(self):
+        """
+        Stops all the streams.
+        """
+        with self._lock:
+            self._wanted.clear()
+            threads = list(self._threads.values())
+        self._closed.set()
+        for thread in threads:
+            thread.join(STREAM_TIMEOUT_SEC)
+        self.pool.close()
+
+    def _stream(self, docker_id, first_sample):
+        """
+        Consumes the stats stream of a container until it is no longer wanted.
+
+        :param docker_id: The full Docker container ID.
+        :param first_sample: The Event set when the first sample arrives.
+        """
+        failures = 0
+        while docker_id in self._wanted:
+            conn = self.pool.acquire()
+            try:
+                conn.request("GET", f"/containers/{docker_id}/stats?stream=true")
+                response = conn.getresponse()
+                if response.status != 200:
+                    response.read()
+                    raise HTTPException(f"stats stream returned status code {response.status}")
+                while docker_id in self._wanted:
+                    line = response.readline()
+                    if not line:
+                        break
+                    self._latest[docker_id] = (line, None)
+                    first_sample.set()
+                    failures = 0
+                else:
+                    conn.close()
+                    break
+                self.pool.release(conn)
+            except (OSError, HTTPException) as e:
+                # Only the first of consecutive failures is worth a warning
+                log = logger.debug if failures else logger.warning
+                log("Stats stream of container %s failed: %s", docker_id, e)
+                conn.close()
+                failures += 1
+            self._closed.wait(
+                min(RECONNECT_INTERVAL_SEC * 2 ** max(0, failures - 1), MAX_RECONNECT_INTERVAL_SEC)
+            )
+
+        with self._lock:
+            self._threads.pop(docker_id, None)
+            self._first_sample.pop(docker_id, None)
+            self._latest.pop(docker_id, None)
+
+    def ensure_streams(self, docker_ids):
+        """
+        Starts streams for new containers and stops streams of removed containers.
+
+        :param docker_ids: The full Docker container IDs of the task.
+        """
+        with self._lock:
+            self._wanted = set(docker_ids)
+            for docker_id in self._wanted:
+                if docker_id in self._threads:
+                    continue
+                first_sample = threading.Event()
+                self._first_sample[docker_id] = first_sample
+                thread = threading.Thread(
+                    target=self._stream, args=(docker_id, first_sample),
+                    name=f"stats-{docker_id[:12]}", daemon=True,
+                )
+                self._threads[docker_id] = thread
+                thread.start()
+
+    def latest(self, docker_id):
+        """
+        Returns the latest decoded stats sample of a container.
+
+        :param docker_id: The full Docker container ID.
+        :return: The Docker stats API dictionary, or None if no sample has arrived.
+        """
+        entry = self._latest.get(docker_id)
+        if entry is None:
+            return None
+        line, sample = entry
+        if sample is None:
+            sample = json.loads(line)
+            self._latest[docker_id] = (line, sample)
+        return sample
+
+    def read_stats(self, containers):
+        """
+        Returns the latest statistics of the given task containers.
+
+        Waits up to first_sample_timeout for the first sample of newly streamed containers,
+        once per stream: later reads return without waiting, with or without a sample.
+
+        :param containers: The "Containers" list of the task metadata.
+        :return: A dictionary of DockerId to stats, shaped like /task/stats.
+        """
+        self.ensure_streams([container["DockerId"] for container in containers])
+        deadline = time.monotonic() + self.first_sample_timeout
+        stats = {}
+        for container in containers:
+            docker_id = container["DockerId"]
+            first_sample = self._first_sample.pop(docker_id, None)
+            if first_sample is not None:
+                first_sample.wait(max(0.0, deadline - time.monotonic()))
+            sample = self.latest(docker_id)
+            if sample is None:
+                logger.debug("No stats sample of container %s yet", docker_id)
+                continue
+            stats[docker_id] = {
+                **sample,
+                "id": docker_id,
+                "name": container.get("DockerName", container["Name"]),
+            }
+        return stats
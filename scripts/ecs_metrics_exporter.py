@@ -16,368 +16,91 @@ and returns plain text formatted for prometheus.
 import os
 import logging
 
-import requests
 import uvicorn
-from prometheus_client import Counter, Gauge
-from prometheus_client import generate_latest
-from prometheus_client.core import CollectorRegistry
-from fastapi import FastAPI, Response
-from dateutil import parser
-from starlette.responses import PlainTextResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from starlette.responses import PlainTextResponse, JSONResponse, StreamingResponse
+
+from scripts.collector import (
+    DELTA_HEADER,
+    GENERATION_HEADER,
+    fetch_task_metadata,
+    fetch_task_stats,
+    render_delta,
+    render_metrics,
+)
+from scripts.series_filter import get_series_filter
+from scripts.stats_broadcast import StatsBroadcaster, frame_ndjson, frame_sse
 
 VERSION = "0.1.2"
-METADATA_URL_ENV = "ECS_CONTAINER_METADATA_URI_V4"
 LISTEN_PORT = os.getenv("ECS_METRICS_EXPORTER_PORT", "9546")
+STREAM_INTERVAL = float(os.getenv("ECS_METRICS_EXPORTER_STREAM_INTERVAL", "1"))
+STREAM_QUEUE_SIZE = int(os.getenv("ECS_METRICS_EXPORTER_STREAM_QUEUE_SIZE", "4"))
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
+stats_broadcaster = StatsBroadcaster(fetch_task_stats, STREAM_INTERVAL, STREAM_QUEUE_SIZE)
 
 
-def create_metrics(registry):
+def series_filter_of(names, matches, containers):
     """
-    Creates and returns a dictionary of Prometheus metrics for ECS containers and tasks.
+    Returns the SeriesFilter of the selector query parameters, or None without them.
 
-    Args:
-        registry: The Prometheus registry to which the metrics will be registered.
-
-    Returns:
-        dict: A dictionary containing Prometheus Counter and Gauge metrics with the following keys:
-            - "counter_cpu_usage_sec": Counter for total CPU usage in seconds.
-            - "gauge_mem_usage_total_bytes": Gauge for total memory usage in bytes (including cache).
-            - "gauge_mem_usage_total_bytes_without_cache": Gauge for memory usage in bytes (excluding cache).
-            - "gauge_network_io_rx_bytes": Gauge for network I/O received bytes.
-            - "gauge_network_io_tx_bytes": Gauge for network I/O transmitted bytes.
-            - "gauge_block_io_read_bytes": Gauge for block I/O read bytes.
-            - "gauge_block_io_write_bytes": Gauge for block I/O write bytes.
-            - "gauge_block_io_read_ops": Gauge for block I/O read operations.
-            - "gauge_block_io_write_ops": Gauge for block I/O write operations.
-            - "gauge_pull_started_at_time": Gauge for task pull start time in epoch.
-            - "gauge_pull_stopped_at_time": Gauge for task pull stop time in epoch.
-            - "gauge_container_last_started_at_time": Gauge for the last container start time in epoch.
-            - "gauge_task_cpu_limit": Gauge for task CPU limit.
-            - "gauge_task_memory_limit_byte": Gauge for task memory limit in bytes.
-            - "ecs_metrics_exporter_success": Gauge indicating if the ECS metrics exporter succeeded
-              (0 for failure, 1 for success).
-    """
-
-    labels = ["container_name", "container_id", "task_family", "task_revision"]
-    return {
-        "counter_cpu_usage_sec": Counter(
-            "ee_container_cpu_usage_seconds_total",
-            "cpu_stats->cpu_usage->total_usage convert nano sec to sec",
-            labels,
-            registry=registry,
-        ),
-        "gauge_mem_usage_total_bytes": Gauge(
-            "ee_container_memory_usage_byte",
-            "memory_stats->usage with cache",
-            labels,
-            registry=registry,
-        ),
-        "gauge_mem_usage_total_bytes_without_cache": Gauge(
-            "ee_container_memory_usage_without_cache_byte",
-            "memory_stats->usage - memory_stats->cache",
-            labels,
-            registry=registry,
-        ),
-        "gauge_network_io_rx_bytes": Gauge(
-            "ee_container_network_io_rx_bytes",
-            "network_io_rx_bytes",
-            labels,
-            registry=registry,
-        ),
-        "gauge_network_io_tx_bytes": Gauge(
-            "ee_container_network_io_tx_bytes",
-            "network_io_tx_bytes",
-            labels,
-            registry=registry,
-        ),
-        "gauge_block_io_read_bytes": Gauge(
-            "ee_container_block_io_read_bytes",
-            "block_io_read_bytes",
-            labels,
-            registry=registry,
-        ),
-        "gauge_block_io_write_bytes": Gauge(
-            "ee_container_block_io_write_bytes",
-            "block_io_write_bytes",
-            labels,
-            registry=registry,
-        ),
-        "gauge_block_io_read_ops": Gauge(
-            "ee_container_block_io_read_ops",
-            "block_io_read_ops",
-            labels,
-            registry=registry,
-        ),
-        "gauge_block_io_write_ops": Gauge(
-            "ee_container_block_io_write_ops",
-            "block_io_write_ops",
-            labels,
-            registry=registry,
-        ),
-        "gauge_pull_started_at_time": Gauge(
-            "ee_task_pull_started_at_time",
-            "tasks PullStartedAt epoch",
-            labels,
-            registry=registry,
-        ),
-        "gauge_pull_stopped_at_time": Gauge(
-            "ee_task_pull_stopped_at_time",
-            "tasks PullStoppedAt epoch",
-            labels,
-            registry=registry,
-        ),
-        "gauge_container_last_started_at_time": Gauge(
-            "ee_container_last_started_at_time",
-            "epoch that maximum StartedAt in all containers",
-            labels,
-            registry=registry,
-        ),
-        "gauge_task_cpu_limit": Gauge(
-            "ee_task_cpu_limit",
-            "task cpu limit (ex. 0.5, 1.0..)",
-            labels,
-            registry=registry,
-        ),
-        "gauge_task_memory_limit_byte": Gauge(
-            "ee_task_memory_limit_byte",
-            "task memory limit bytes",
-            labels,
-            registry=registry,
-        ),
-        "ecs_metrics_exporter_success": Gauge(
-            "ecs_metrics_exporter_success",
-            "Indicates if the ECS metrics exporter succeeded. 0 for failure, 1 for success.",
-            registry=registry,
-        ),
-    }
-
-
-def get_short_container_id(container_id_full):
-    """
-    Extracts and returns the short form of the container ID.
-
-    :param container_id_full: The full container ID.
-    :return: The short container ID (first 12 characters).
-    """
-    return container_id_full[:12]
-
-
-def fetch_task_metadata():
-    """
-    Fetches and decodes the task metadata and statistics from the ECS metadata endpoint.
-
-    :return: A tuple of (task_metadata, task_stats).
-    """
-    metadata_url = os.getenv(METADATA_URL_ENV)
-    task_url = f"{metadata_url}/task"
-    stats_url = f"{metadata_url}/task/stats"
-
-    response_task = requests.get(task_url, timeout=5)
-    if not response_task.ok:
-        raise requests.exceptions.HTTPError(
-            f"Failed to fetch task metadata with status code {response_task.status_code}"
-        )
-    task = response_task.json()
-
-    response_stats = requests.get(stats_url, timeout=5)
-    if not response_stats.ok:
-        raise requests.exceptions.HTTPError(
-            f"Failed to fetch stats metadata with status code {response_stats.status_code}"
-        )
-    stats = response_stats.json()
-
-    return task, stats
-
-
-def str2epoch(time_str):
-    """
-    Converts a time string with potential nanoseconds into an epoch timestamp.
-
-    :param time_str: The time string, possibly including nanoseconds.
-    :return: The epoch timestamp as an integer.
+    Invalid selectors are answered with a 400 response.
     """
-    dt = parser.parse(time_str)
-    return int(dt.timestamp())
-
-
-def collect_ecs_task_metadata():
-    """
-    Collects metrics from ECS task metadata and updates the Prometheus metrics.
-
-    This function fetches task metadata, computes various metrics based on the metadata,
-    and updates the Prometheus metrics accordingly.
-    """
-    registry = CollectorRegistry(auto_describe=False)
-    metrics = create_metrics(registry)
-
     try:
-        task, stats = fetch_task_metadata()
-
-        task_containers_info = {}
-        for ci in task.get("Containers", []):
-            task_containers_info[ci["DockerId"]] = ci
-
-        # Task info
-        task_family = task["Family"]
-        task_revision = task["Revision"]
-        task_labels = {
-            "container_name": "_task_",
-            "container_id": "_task_",
-            "task_family": task_family,
-            "task_revision": task_revision,
-        }
-
-        # Task pull times
-        pull_start = str2epoch(task["PullStartedAt"]) if "PullStartedAt" in task else 0
-        pull_stop = str2epoch(task["PullStoppedAt"]) if "PullStoppedAt" in task else 0
-        metrics["gauge_pull_started_at_time"].labels(**task_labels).set(pull_start)
-        metrics["gauge_pull_stopped_at_time"].labels(**task_labels).set(pull_stop)
-
-        # Task limits
-        task_cpu_limit = float(task["Limits"]["CPU"])
-        task_memory_limit_bytes = int(task["Limits"]["Memory"]) * 1024 * 1024
-        metrics["gauge_task_cpu_limit"].labels(**task_labels).set(task_cpu_limit)
-        metrics["gauge_task_memory_limit_byte"].labels(**task_labels).set(
-            task_memory_limit_bytes
-        )
-
-        sum_of_cpu_usage_sec = 0
-        sum_of_memory_usage_bytes = 0
-        sum_of_memory_usage_actual_bytes = 0
-        sum_of_network_io_rx_bytes = 0
-        sum_of_network_io_tx_bytes = 0
-        sum_of_block_io_read_bytes = 0
-        sum_of_block_io_write_bytes = 0
-        sum_of_block_io_read_ops = 0
-        sum_of_block_io_write_ops = 0
-
-        # Process each container in the task
-        last_started_at_time = 0
-        for container_stat in stats.values():
-            container_id = get_short_container_id(container_stat["id"])
-            container_name = container_stat["name"]
-            labels = {
-                "container_name": container_name,
-                "container_id": container_id,
-                "task_family": task_family,
-                "task_revision": task_revision,
-            }
-
-            # Container start time
-            started_at = str2epoch(
-                task_containers_info[container_stat["id"]]["StartedAt"]
-            )
-            last_started_at_time = max(last_started_at_time, started_at)
-
-            # CPU usage
-            cpu_usage_sec = (
-                container_stat["cpu_stats"]["cpu_usage"]["total_usage"] / 1e9
-            )
-            metrics["counter_cpu_usage_sec"].labels(**labels).inc(cpu_usage_sec)
-            sum_of_cpu_usage_sec += cpu_usage_sec
-
-            # Memory usage
-            mem_usage_bytes = container_stat["memory_stats"]["usage"]
-            mem_cache_bytes = container_stat["memory_stats"]["stats"].get("cache", 0)
-            mem_usage_bytes_without_cache = mem_usage_bytes - mem_cache_bytes
-            metrics["gauge_mem_usage_total_bytes"].labels(**labels).set(mem_usage_bytes)
-            metrics["gauge_mem_usage_total_bytes_without_cache"].labels(**labels).set(
-                mem_usage_bytes_without_cache
-            )
-            sum_of_memory_usage_bytes += mem_usage_bytes
-            sum_of_memory_usage_actual_bytes += mem_usage_bytes_without_cache
-
-            # Network IO
-            rx_bytes = sum(
-                interface["rx_bytes"]
-                for interface in container_stat["networks"].values()
-            )
-            tx_bytes = sum(
-                interface["tx_bytes"]
-                for interface in container_stat["networks"].values()
-            )
-            metrics["gauge_network_io_rx_bytes"].labels(**labels).set(rx_bytes)
-            metrics["gauge_network_io_tx_bytes"].labels(**labels).set(tx_bytes)
-            sum_of_network_io_rx_bytes += rx_bytes
-            sum_of_network_io_tx_bytes += tx_bytes
-
-            # Block IO
-            for blk_io in container_stat["blkio_stats"]["io_service_bytes_recursive"]:
-                if blk_io["op"] == "Read":
-                    metrics["gauge_block_io_read_bytes"].labels(**labels).set(
-                        blk_io["value"]
-                    )
-                    sum_of_block_io_read_bytes += blk_io["value"]
-                elif blk_io["op"] == "Write":
-                    metrics["gauge_block_io_write_bytes"].labels(**labels).set(
-                        blk_io["value"]
-                    )
-                    sum_of_block_io_write_bytes += blk_io["value"]
-
-            for blk_io in container_stat["blkio_stats"]["io_serviced_recursive"]:
-                if blk_io["op"] == "Read":
-                    metrics["gauge_block_io_read_ops"].labels(**labels).set(
-                        blk_io["value"]
-                    )
-                    sum_of_block_io_read_ops += blk_io["value"]
-                elif blk_io["op"] == "Write":
-                    metrics["gauge_block_io_write_ops"].labels(**labels).set(
-                        blk_io["value"]
-                    )
-                    sum_of_block_io_write_ops += blk_io["value"]
-
-        metrics["counter_cpu_usage_sec"].labels(**task_labels).inc(sum_of_cpu_usage_sec)
-        metrics["gauge_mem_usage_total_bytes"].labels(**task_labels).set(
-            sum_of_memory_usage_bytes
-        )
-        metrics["gauge_mem_usage_total_bytes_without_cache"].labels(**task_labels).set(
-            sum_of_memory_usage_actual_bytes
-        )
-        metrics["gauge_network_io_rx_bytes"].labels(**task_labels).set(
-            sum_of_network_io_rx_bytes
-        )
-        metrics["gauge_network_io_tx_bytes"].labels(**task_labels).set(
-            sum_of_network_io_tx_bytes
-        )
-        metrics["gauge_block_io_read_bytes"].labels(**task_labels).set(
-            sum_of_block_io_read_bytes
-        )
-        metrics["gauge_block_io_write_bytes"].labels(**task_labels).set(
-            sum_of_block_io_write_bytes
-        )
-        metrics["gauge_block_io_read_ops"].labels(**task_labels).set(
-            sum_of_block_io_read_ops
-        )
-        metrics["gauge_block_io_write_ops"].labels(**task_labels).set(
-            sum_of_block_io_write_ops
-        )
-
-        # Set the last started container time for the task
-        metrics["gauge_container_last_started_at_time"].labels(**task_labels).set(
-            last_started_at_time
-        )
-        metrics["ecs_metrics_exporter_success"].set(1)
-    except requests.exceptions.RequestException as e:
-        logger.error("Failed to fetch some metrics: %s", e)
-        metrics["ecs_metrics_exporter_success"].set(0)
-
-    return generate_latest(registry)
+        return get_series_filter(tuple(names), tuple(matches), tuple(containers))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
 
 
 @app.get("/metrics", response_class=PlainTextResponse)
-def metrics_endpoint():
+def metrics_endpoint(
+    request: Request,
+    names: list[str] = Query(default=[], alias="name[]"),
+    matches: list[str] = Query(default=[], alias="match[]"),
+    container: list[str] = Query(default=[]),
+):
     """
     Endpoint to provide Prometheus-formatted metrics.
 
     This function is called when the '/metrics' endpoint is accessed.
-    It collects ECS task metadata and returns the metrics in plain text format.
-    """
-    metrics_data = collect_ecs_task_metadata()
-    return Response(content=metrics_data, media_type="text/plain")
+    It collects ECS task metadata and returns the metrics in plain text format, or in the
+    OpenMetrics or protobuf format when the Accept header prefers them.
+    The series can be restricted with 'name[]' metric family names, 'match[]' series
+    selectors and 'container' container names.
+    """
+    series_filter = series_filter_of(names, matches, container)
+    metrics_data, content_type = render_metrics(request.headers.get("accept"), series_filter)
+    return Response(content=metrics_data, media_type=content_type)
+
+
+@app.get("/metrics/delta", response_class=PlainTextResponse)
+def metrics_delta_endpoint(
+    since: str = Query(default=None),
+    names: list[str] = Query(default=[], alias="name[]"),
+    matches: list[str] = Query(default=[], alias="match[]"),
+    container: list[str] = Query(default=[]),
+):
+    """
+    Endpoint to provide the Prometheus-formatted series changed since a generation.
+
+    This function is called when the '/metrics/delta' endpoint is accessed.
+    It collects ECS task metadata and returns only the series that changed after the
+    generation token given as 'since', plus a '# REMOVED <series>' line per removed series.
+    Without a valid token, all series are returned. The token of the returned snapshot
+    is set in the X-Metrics-Generation response header, and the X-Metrics-Delta response
+    header is 'delta' or 'full' for all series. The series can be restricted like those
+    of '/metrics'.
+    """
+    series_filter = series_filter_of(names, matches, container)
+    metrics_data, token, delta = render_delta(since, series_filter)
+    return Response(
+        content=metrics_data,
+        media_type="text/plain",
+        headers={GENERATION_HEADER: token, DELTA_HEADER: "delta" if delta else "full"},
+    )
 
 
 @app.get("/stats", response_class=JSONResponse)
@@ -392,6 +115,27 @@ def stats_endpoint():
     return JSONResponse(content=task_stats)
 
 
+@app.get("/stats/stream")
+async def stats_stream_endpoint(request: Request):
+    """
+    Endpoint to stream raw JSON statistics.
+
+    This function is called when the '/stats/stream' endpoint is accessed.
+    It streams each statistics sample of the shared poller as Server-Sent Events, or as
+    newline delimited JSON when the client accepts application/x-ndjson.
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stats_broadcaster.stream(frame_ndjson),
+            media_type="application/x-ndjson",
+            headers=headers,
+        )
+    return StreamingResponse(
+        stats_broadcaster.stream(frame_sse), media_type="text/event-stream", headers=headers
+    )
+
+
 @app.get("/task", response_class=JSONResponse)
 def task_endpoint():
     """
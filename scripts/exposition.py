@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+exposition - exposition format negotiation and the Prometheus protobuf encoding
+
+The /metrics format is chosen from the Accept header of the scrape, honouring its
+q-values: the classic text format, OpenMetrics text, or the delimited protobuf
+io.prometheus.client.MetricFamily messages that Prometheus requests when its protobuf
+scraping is enabled.
+
+The protobuf messages are encoded here without the protobuf package, for the counter,
+gauge and untyped families the exporter produces.
+"""
+
+import struct
+
+from prometheus_client.core import CollectorRegistry
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST as OPENMETRICS_TYPE
+from prometheus_client.openmetrics.exposition import generate_latest as generate_openmetrics
+
+TEXT_TYPE = "text/plain; charset=utf-8"
+PROTOBUF_TYPE = (
+    "application/vnd.google.protobuf; proto=io.prometheus.client.MetricFamily; "
+    "encoding=delimited"
+)
+PROTOBUF_MEDIA_TYPE = "application/vnd.google.protobuf"
+OPENMETRICS_MEDIA_TYPE = "application/openmetrics-text"
+
+# io.prometheus.client.MetricType
+COUNTER, GAUGE, UNTYPED = 0, 1, 3
+METRIC_TYPES = {"counter": COUNTER, "gauge": GAUGE}
+DOUBLE = struct.Struct("<d")
+
+
+def parse_accept(accept):
+    """
+    Parses an Accept header.
+
+    :param accept: The header value.
+    :return: A list of (media type, parameters dictionary, q-value) in header order.
+    """
+    media_ranges = []
+    for media_range in (accept or "").split(","):
+        media_type, *params = media_range.split(";")
+        parameters = {}
+        for param in params:
+            name, _, value = param.partition("=")
+            parameters[name.strip().lower()] = value.strip().strip('"')
+        try:
+            quality = float(parameters.pop("q", "1"))
+        except ValueError:
+            quality = 0.0
+        if media_type.strip():
+            media_ranges.append((media_type.strip().lower(), parameters, quality))
+    return media_ranges
+
+
+def negotiate(accept):
+    """
+    Chooses the exposition format of a scrape.
+
+    :param accept: The Accept header value, or None.
+    :return: "protobuf", "openmetrics" or "text".
+    """
+    best, best_quality = "text", 0.0
+    for media_type, parameters, quality in parse_accept(accept):
+        if media_type == PROTOBUF_MEDIA_TYPE and (
+            parameters.get("proto") == "io.prometheus.client.MetricFamily"
+            and parameters.get("encoding") == "delimited"
+        ):
+            exposition_format = "protobuf"
+        elif media_type == OPENMETRICS_MEDIA_TYPE:
+            exposition_format = "openmetrics"
+        elif media_type in ("text/plain", "text/*", "*/*"):
+            exposition_format = "text"
+        else:
+            continue
+        if quality > best_quality:
+            best, best_quality = exposition_format, quality
+    return best
+
+
+def transform_samples(registry, transform):
+    """
+    Returns a registry exposing the metrics of another one with transformed samples.
+
+    :param registry: The CollectorRegistry to transform.
+    :param transform: A callable taking (metric, sample) and returning the sample to
+        expose, or None to leave it out.
+    :return: The transformed CollectorRegistry.
+    """
+
+    class Transformed:  # pylint: disable=too-few-public-methods
+        """
+        Collector applying the transform to the samples of the registry.
+        """
+
+        def collect(self):
+            """
+            Yields the transformed metrics.
+            """
+            for metric in registry.collect():
+                samples = [transform(metric, sample) for sample in metric.samples]
+                metric.samples = [sample for sample in samples if sample is not None]
+                yield metric
+
+    transformed = CollectorRegistry(auto_describe=False)
+    transformed.register(Transformed())
+    return transformed
+
+
+def encode_varint(value):
+    """
+    Encodes an unsigned integer as a protobuf varint.
+    """
+    output = bytearray()
+    while value > 0x7F:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+    return bytes(output)
+
+
+def encode_bytes_field(number, value):
+    """
+    Encodes a length-delimited field, a string or an embedded message.
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return encode_varint(number << 3 | 2) + encode_varint(len(value)) + value
+
+
+def encode_double_field(number, value):
+    """
+    Encodes a double field.
+    """
+    return encode_varint(number << 3 | 1) + DOUBLE.pack(value)
+
+
+def encode_varint_field(number, value):
+    """
+    Encodes an int64 or enum field, negative values as ten byte varints.
+    """
+    return encode_varint(number << 3) + encode_varint(value & 0xFFFFFFFFFFFFFFFF)
+
+
+def encode_timestamp(seconds):
+    """
+    Encodes a google.protobuf.Timestamp message.
+    """
+    whole = int(seconds // 1)
+    nanos = int(round((seconds - whole) * 1e9))
+    if nanos >= 1000000000:
+        whole, nanos = whole + 1, nanos - 1000000000
+    return encode_varint_field(1, whole) + (encode_varint_field(2, nanos) if nanos else b"")
+
+
+def encode_labels(labels, cache):
+    """
+    Encodes the LabelPair fields of a metric.
+
+    :param labels: The labels dictionary.
+    :param cache: A dictionary of sorted label pairs to their encoding, shared by the
+        families of a registry since most of them have the same label sets.
+    """
+    key = tuple(sorted(labels.items()))
+    encoded = cache.get(key)
+    if encoded is None:
+        encoded = cache[key] = b"".join(
+            encode_bytes_field(1, encode_bytes_field(1, label) + encode_bytes_field(2, text))
+            for label, text in key
+        )
+    return encoded
+
+
+def encode_metric_family(name, documentation, metric_type, metrics, label_cache=None):
+    """
+    Encodes a delimited io.prometheus.client.MetricFamily message.
+
+    :param name: The family name.
+    :param documentation: The HELP text.
+    :param metric_type: The MetricType number.
+    :param metrics: A list of (labels dictionary, value, timestamp in seconds or None,
+        created time in seconds or None).
+    :param label_cache: An optional dictionary of label encodings, see encode_labels().
+    :return: The message prefixed with its varint length.
+    """
+    label_cache = {} if label_cache is None else label_cache
+    value_field = {COUNTER: 3, GAUGE: 2}.get(metric_type, 5)
+    message = [
+        encode_bytes_field(1, name),
+        encode_bytes_field(2, documentation),
+        encode_varint_field(3, metric_type),
+    ]
+    for labels, value, timestamp, created in metrics:
+        metric = [encode_labels(labels, label_cache)]
+        value_message = encode_double_field(1, value)
+        if created is not None:
+            value_message += encode_bytes_field(3, encode_timestamp(created))
+        metric.append(encode_bytes_field(value_field, value_message))
+        if timestamp is not None:
+            metric.append(encode_varint_field(6, int(round(float(timestamp) * 1000))))
+        message.append(encode_bytes_field(4, b"".join(metric)))
+    message = b"".join(message)
+    return encode_varint(len(message)) + message
+
+
+def generate_protobuf(registry):
+    """
+    Encodes the metrics of a registry as delimited protobuf MetricFamily messages.
+
+    Counters carry their _created sample as created_timestamp. Metrics of types other than
+    counter and gauge are encoded as one untyped family per sample name.
+
+    :param registry: The CollectorRegistry.
+    :return: The encoded bytes.
+    """
+    output = []
+    label_cache = {}
+    for metric in registry.collect():
+        metric_type = METRIC_TYPES.get(metric.type)
+        if metric_type is None:
+            families = {}
+            for sample in metric.samples:
+                families.setdefault(sample.name, []).append(
+                    (sample.labels, sample.value, sample.timestamp, None)
+                )
+            output.extend(
+                encode_metric_family(name, metric.documentation, UNTYPED, metrics, label_cache)
+                for name, metrics in families.items()
+            )
+            continue
+
+        name = metric.name + "_total" if metric_type == COUNTER else metric.name
+        metrics = {}
+        created = {}
+        for sample in metric.samples:
+            key = tuple(sorted(sample.labels.items()))
+            if sample.name == metric.name + "_created":
+                created[key] = sample.value
+            elif sample.name == name:
+                metrics[key] = (sample.labels, sample.value, sample.timestamp)
+        output.append(encode_metric_family(
+            name,
+            metric.documentation,
+            metric_type,
+            [(*values, created.get(key)) for key, values in metrics.items()],
+            label_cache,
+        ))
+    return b"".join(output)
+
+
+def generate(registry, exposition_format):
+    """
+    Renders a registry in an exposition format other than the classic text format.
+
+    :param registry: The CollectorRegistry.
+    :param exposition_format: "protobuf" or "openmetrics".
+    :return: A tuple of (content bytes, content type).
+    """
+    if exposition_format == "protobuf":
+        return generate_protobuf(registry), PROTOBUF_TYPE
+    return generate_openmetrics(registry), OPENMETRICS_TYPE
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+lean_server - minimal-footprint server mode of ecs_metrics_exporter
+
+This module serves the same /metrics, /metrics/delta, /stats and /task contract as the
+FastAPI application with an asyncio HTTP/1.1 server from the standard library. It does not
+import FastAPI, pydantic, Starlette, uvicorn, requests or dateutil, which shortens the cold
+start and lowers the resident memory of the sidecar.
+
+Run it instead of ecs_metrics_exporter.py:
+
+    python /scripts/lean_server.py
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+from urllib.parse import parse_qs, urlsplit
+
+from scripts import collector
+from scripts.series_filter import get_series_filter
+
+LISTEN_PORT = os.getenv("ECS_METRICS_EXPORTER_PORT", "9546")
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+JSON_TYPE = "application/json"
+TEXT_TYPE = "text/plain; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_route(query, headers, delta=False):
+    """
+    Collects ECS task metadata and returns the metrics in the format negotiated from the
+    Accept header, plain text by default.
+
+    The series are restricted by the name[], match[] and container query parameters, and
+    with delta, to those changed since the generation token of the since parameter, in
+    plain text.
+    """
+    try:
+        series_filter = get_series_filter(
+            tuple(query.get("name[]", ())),
+            tuple(query.get("match[]", ())),
+            tuple(query.get("container", ())),
+        )
+    except ValueError as e:
+        return error_response(400, str(e))
+    if delta:
+        metrics_data, token, is_delta = collector.render_delta(
+            query.get("since", [None])[0], series_filter
+        )
+        return 200, TEXT_TYPE, metrics_data, {
+            collector.GENERATION_HEADER: token,
+            collector.DELTA_HEADER: "delta" if is_delta else "full",
+        }
+    metrics_data, content_type = collector.render_metrics(headers.get("accept"), series_filter)
+    return 200, content_type, metrics_data, {}
+
+
+def stats_route(*_):
+    """
+    Returns raw JSON statistics obtained from the ECS metadata endpoint.
+    """
+    _, task_stats = collector.fetch_task_metadata()
+    return 200, JSON_TYPE, json.dumps(task_stats).encode("utf-8"), {}
+
+
+def task_route(*_):
+    """
+    Returns raw JSON task metadata obtained from the ECS metadata endpoint.
+    """
+    task_metadata, _ = collector.fetch_task_metadata()
+    return 200, JSON_TYPE, json.dumps(task_metadata).encode("utf-8"), {}
+
+
+ROUTES = {
+    "/metrics": metrics_route,
+    "/metrics/delta": functools.partial(metrics_route, delta=True),
+    "/stats": stats_route,
+    "/task": task_route,
+}
+
+
+def error_response(status, detail=None):
+    """
+    Returns an error response with a FastAPI compatible body.
+
+    :param status: The HTTP status code.
+    :param detail: The error detail, the reason phrase by default.
+    """
+    if status == 500:
+        return status, TEXT_TYPE, b"Internal Server Error", {}
+    body = json.dumps({"detail": detail or REASONS[status]}).encode("utf-8")
+    return status, JSON_TYPE, body, {}
+
+
+async def respond(method, target, headers, routes=None, run_in_executor=True):
+    """
+    Dispatches a request to its route.
+
+    :param method: The request method.
+    :param target: The request target, path and query.
+    :param headers: The request headers with lower-cased names.
+    :param routes: A dictionary of path to route function, called with the parsed query
+        and the headers, ROUTES by default.
+    :param run_in_executor: Whether the routes block and run in the default executor.
+    :return: A tuple of (status, content type, body, extra headers).
+    """
+    url = urlsplit(target)
+    route = (routes or ROUTES).get(url.path)
+    if route is None:
+        return error_response(404)
+    if method not in ("GET", "HEAD"):
+        return error_response(405)
+    try:
+        if not run_in_executor:
+            return route(parse_qs(url.query), headers)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, route, parse_qs(url.query), headers
+        )
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Failed to serve %s", url.path)
+        return error_response(500)
+
+
+def parse_head(head):
+    """
+    Parses the request line and headers.
+
+    :param head: The request head bytes, up to the empty line.
+    :return: A tuple of (method, target, version, headers with lower-cased names).
+    """
+    request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+    method, target, version = request_line.split(" ")
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def wants_keep_alive(version, headers):
+    """
+    Returns whether the connection is kept open after the response.
+    """
+    connection = headers.get("connection", "").lower()
+    return connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+
+async def handle_connection(reader, writer, **route_options):
+    """
+    Serves the requests of one keep-alive connection.
+
+    :param route_options: The routes and run_in_executor arguments of respond().
+    """
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            try:
+                method, target, version, headers = parse_head(head)
+                content_length = int(headers.get("content-length", "0"))
+            except ValueError:
+                method, version, headers = "GET", "HTTP/1.0", {}
+                status, content_type, body, extra = error_response(400)
+            else:
+                if content_length:
+                    await reader.readexactly(content_length)
+                status, content_type, body, extra = await respond(
+                    method, target, headers, **route_options
+                )
+
+            keep_alive = wants_keep_alive(version, headers)
+            response_head = [
+                f"HTTP/1.1 {status} {REASONS[status]}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            ]
+            response_head.extend(f"{name}: {value}" for name, value in extra.items())
+            writer.write("\r\n".join(response_head).encode("latin-1") + b"\r\n\r\n")
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                return
+    except ConnectionError:
+        return
+    finally:
+        writer.close()
+
+
+async def serve(host="0.0.0.0", port=int(LISTEN_PORT), started=None, **kwargs):
+    """
+    Serves requests until cancelled.
+
+    :param host: The listen address.
+    :param port: The listen port, 0 for an ephemeral one.
+    :param started: An optional callable receiving the server once it is listening.
+    :param kwargs: sock, an already listening socket to serve instead of host and port,
+        and the routes and run_in_executor arguments of handle_connection().
+    """
+    sock = kwargs.pop("sock", None)
+    handler = functools.partial(handle_connection, **kwargs)
+    if sock is not None:
+        server = await asyncio.start_server(handler, sock=sock)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    if started is not None:
+        started(server)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
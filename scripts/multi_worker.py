@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+multi_worker - multi-process serving mode of ecs_metrics_exporter
+
+A single collector process fetches the task metadata and statistics every
+ECS_METRICS_EXPORTER_COLLECT_INTERVAL seconds, renders /metrics, /stats and /task once and
+publishes them into a shared memory snapshot. ECS_METRICS_EXPORTER_WORKERS lean server
+processes accept connections on one shared listening socket and answer scrapes from the
+snapshot, so the serving throughput scales with the cores while the upstream is fetched
+once per interval whatever the number of workers and scrapers.
+
+With ECS_METRICS_EXPORTER_ADAPTIVE_POLLING, the workers report the /metrics scrapes to the
+collector, and an AdaptiveScheduler times the collections to land just before the
+expected scrapes, falling back to ECS_METRICS_EXPORTER_IDLE_INTERVAL when nothing scrapes.
+
+    ECS_METRICS_EXPORTER_WORKERS=4 python /scripts/multi_worker.py
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+from prometheus_client import generate_latest
+
+from scripts import collector, lean_server
+from scripts.adaptive_scheduler import AdaptiveScheduler, sample_values
+from scripts.shared_snapshot import (
+    DEFAULT_SNAPSHOT_SIZE,
+    SharedSnapshotReader,
+    SharedSnapshotWriter,
+    SnapshotTooLarge,
+)
+
+WORKERS = os.getenv("ECS_METRICS_EXPORTER_WORKERS", str(os.cpu_count() or 1))
+COLLECT_INTERVAL = os.getenv("ECS_METRICS_EXPORTER_COLLECT_INTERVAL", "5")
+ADAPTIVE_POLLING = os.getenv("ECS_METRICS_EXPORTER_ADAPTIVE_POLLING", "false")
+IDLE_INTERVAL = os.getenv("ECS_METRICS_EXPORTER_IDLE_INTERVAL", "60")
+SNAPSHOT_FILE = os.getenv("ECS_METRICS_EXPORTER_SNAPSHOT_FILE", "")
+SNAPSHOT_SIZE = os.getenv("ECS_METRICS_EXPORTER_SNAPSHOT_SIZE", str(DEFAULT_SNAPSHOT_SIZE))
+LISTEN_BACKLOG = 1024
+SELECTOR_PARAMETERS = frozenset(("name[]", "match[]", "container"))
+
+logger = logging.getLogger(__name__)
+
+
+def default_snapshot_file():
+    """
+    Returns a snapshot file path on /dev/shm when available, in the temp directory otherwise.
+    """
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"ecs-metrics-exporter-{os.getpid()}.snapshot")
+
+
+def collect_snapshot(observe=None):
+    """
+    Collects ECS task metadata once and renders the served payloads.
+
+    :param observe: An optional callable receiving the collected CollectorRegistry.
+    :return: A tuple of the /metrics text, the /stats JSON and the /task JSON as bytes.
+        The JSON payloads are empty when the metadata could not be fetched.
+    """
+    fetched = {}
+
+    def fetch():
+        # The JSON bytes of the metadata endpoint are served as they are
+        fetched["task"], fetched["stats"] = collector.fetch_task_metadata(decode=False)
+        return fetched["task"], fetched["stats"]
+
+    registry = collector.collect_ecs_task_registry(fetch)
+    if observe is not None:
+        observe(registry)
+    metrics_data = generate_latest(registry)
+    if not fetched:
+        return metrics_data, b"", b""
+    return (
+        metrics_data,
+        encode_json(fetched["stats"]),
+        encode_json(fetched["task"]),
+    )
+
+
+def encode_json(document):
+    """
+    Returns a document as JSON bytes, unchanged when it already is.
+    """
+    if isinstance(document, bytes):
+        return document
+    return json.dumps(document).encode("utf-8")
+
+
+def publish(writer):
+    """
+    Collects and publishes one snapshot, logging failures so the collector keeps running.
+
+    :param writer: The SharedSnapshotWriter.
+    :return: The sample_values() of the published collection, or None if it failed.
+    """
+    collected = {}
+    try:
+        writer.write(*collect_snapshot(lambda registry: collected.update(registry=registry)))
+    except SnapshotTooLarge as e:
+        logger.error("%s, raise ECS_METRICS_EXPORTER_SNAPSHOT_SIZE", e)
+        return None
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception("Failed to collect a snapshot")
+        return None
+    return sample_values(collected["registry"])
+
+
+def wait_for_collect(scheduler, scrapes):
+    """
+    Records the reported scrapes until the scheduler's next collection is due.
+
+    :param scheduler: The AdaptiveScheduler.
+    :param scrapes: The multiprocessing.Queue the workers put the scrape times on.
+    """
+    while True:
+        timeout = scheduler.next_collect(time.monotonic()) - time.monotonic()
+        if timeout <= 0:
+            return
+        try:
+            scheduler.record_scrape(scrapes.get(timeout=timeout))
+        except queue.Empty:
+            return
+
+
+def snapshot_routes(reader, on_scrape=None):
+    """
+    Returns lean server routes answering from a shared snapshot.
+
+    :param reader: The SharedSnapshotReader.
+    :param on_scrape: An optional callable called on every /metrics scrape.
+    :return: A dictionary of path to route function.
+    """
+
+    def payload_route(index, content_type):
+        def route(*_):
+            _, payloads = reader.read()
+            if len(payloads) <= index or not payloads[index]:
+                return lean_server.error_response(500)
+            return 200, content_type, payloads[index], {}
+
+        return route
+
+    full_metrics_route = payload_route(0, lean_server.TEXT_TYPE)
+
+    def metrics_route(query, headers):
+        if SELECTOR_PARAMETERS.intersection(query):
+            return lean_server.error_response(
+                400, "Series selectors are not supported in multi-worker mode"
+            )
+        if on_scrape is not None:
+            on_scrape()
+        return full_metrics_route(query, headers)
+
+    return {
+        "/metrics": metrics_route,
+        "/stats": payload_route(1, lean_server.JSON_TYPE),
+        "/task": payload_route(2, lean_server.JSON_TYPE),
+    }
+
+
+def run_worker(sock, snapshot_file, scrapes=None):
+    """
+    Serves the shared snapshot on an already listening socket until terminated.
+
+    :param sock: The listening socket shared by the workers.
+    :param snapshot_file: The path of the snapshot file.
+    :param scrapes: An optional multiprocessing.Queue the /metrics scrape times are put on.
+    """
+    reader = SharedSnapshotReader(snapshot_file)
+    on_scrape = None if scrapes is None else lambda: scrapes.put_nowait(time.monotonic())
+    asyncio.run(lean_server.serve(
+        sock=sock, routes=snapshot_routes(reader, on_scrape), run_in_executor=False
+    ))
+
+
+def start_workers(sock, snapshot_file, count, scrapes=None):
+    """
+    Starts the serving worker processes.
+
+    :param sock: The listening socket shared by the workers.
+    :param snapshot_file: The path of the snapshot file.
+    :param count: The number of workers.
+    :param scrapes: An optional multiprocessing.Queue the /metrics scrape times are put on.
+    :return: The list of started processes.
+    """
+    workers = []
+    for _ in range(count):
+        worker = Process(
+            target=run_worker, args=(sock, snapshot_file, scrapes), daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+def main():
+    """
+    Runs the collector loop in this process and the serving workers in child processes.
+    """
+    snapshot_file = SNAPSHOT_FILE or default_snapshot_file()
+    interval = float(COLLECT_INTERVAL)
+    scheduler = scrapes = None
+    if ADAPTIVE_POLLING.lower() in ("1", "true", "yes"):
+        scheduler = AdaptiveScheduler(interval, float(IDLE_INTERVAL))
+        scrapes = multiprocessing.Queue()
+    writer = SharedSnapshotWriter(snapshot_file, int(SNAPSHOT_SIZE))
+    started = time.monotonic()
+    values = publish(writer)
+    if scheduler is not None:
+        scheduler.record_collect(started, time.monotonic(), values)
+
+    sock = socket.create_server(("0.0.0.0", int(lean_server.LISTEN_PORT)), backlog=LISTEN_BACKLOG)
+    workers = start_workers(sock, snapshot_file, int(WORKERS), scrapes)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        next_collect = time.monotonic()
+        while True:
+            if scheduler is None:
+                next_collect += interval
+                time.sleep(max(0.0, next_collect - time.monotonic()))
+            else:
+                wait_for_collect(scheduler, scrapes)
+            started = time.monotonic()
+            values = publish(writer)
+            if scheduler is not None:
+                scheduler.record_collect(started, time.monotonic(), values)
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    logger.error(
+                        "Worker %d exited with %s, restarting", worker.pid, worker.exitcode
+                    )
+                    workers[i] = start_workers(sock, snapshot_file, 1, scrapes)[0]
+    finally:
+        for worker in workers:
+            worker.terminate()
+        writer.close()
+        os.unlink(snapshot_file)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
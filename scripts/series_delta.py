@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+series_delta - series level change detection between metric snapshots
+
+Most series, such as limits, pull times and start times, keep their values from one
+scrape to the next. SeriesTracker compares each new snapshot with the previous one per
+series, reuses the rendered text of unchanged series, and records the generation in
+which each series last changed, so a client holding a generation token can be sent only
+the series that changed since then.
+
+The full rendering is identical to prometheus_client.generate_latest().
+
+A snapshot can also be restricted to the series selected by a SeriesFilter. The selection
+of each filter is kept until series are added or removed, and its rendering until one of
+the selected series changes.
+"""
+
+import math
+import threading
+import uuid
+
+from prometheus_client.utils import floatToGoString
+
+OM_SUFFIXES = ("_created", "_gsum", "_gcount")
+NAME_SUFFIXES = {"counter": "_total", "info": "_info"}
+MAX_CACHED_SELECTIONS = 64
+TYPE_NAMES = {
+    "info": "gauge",
+    "stateset": "gauge",
+    "gaugehistogram": "histogram",
+    "unknown": "untyped",
+}
+
+
+def escape_help(documentation):
+    """
+    Escapes a HELP text for the text exposition format.
+    """
+    return documentation.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def render_series_name(name, labels):
+    """
+    Renders the series identifier, name{label="value",...}, of the text exposition format.
+
+    :param name: The sample name.
+    :param labels: A sorted tuple of (label name, label value) pairs.
+    :return: The series identifier.
+    """
+    if not labels:
+        return name
+    return name + "{" + ",".join(
+        '{}="{}"'.format(k, v.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\""))
+        for k, v in labels
+    ) + "}"
+
+
+def render_series(name, labels, value, timestamp):
+    """
+    Renders one sample line of the text exposition format.
+
+    :param name: The sample name.
+    :param labels: A sorted tuple of (label name, label value) pairs.
+    :param value: The sample value.
+    :param timestamp: The sample timestamp in seconds, or None.
+    :return: The sample line.
+    """
+    suffix = "" if timestamp is None else f" {int(float(timestamp) * 1000):d}"
+    return f"{render_series_name(name, labels)} {floatToGoString(value)}{suffix}\n"
+
+
+def same_value(old, new):
+    """
+    Compares two sample values, treating NaN as equal to NaN.
+    """
+    return old == new or (math.isnan(old) and math.isnan(new))
+
+
+def family_blocks(metric, keys, om_keys):
+    """
+    Returns the rendering blocks of a metric family, (name, HELP and TYPE lines, sample
+    keys, whether the block is rendered without samples), the OpenMetrics suffixed
+    samples getting blocks of their own like in generate_latest().
+    """
+    mname = metric.name + NAME_SUFFIXES.get(metric.type, "")
+    mtype = TYPE_NAMES.get(metric.type, metric.type)
+    documentation = escape_help(metric.documentation)
+    blocks = [(mname, f"# HELP {mname} {documentation}\n# TYPE {mname} {mtype}\n", keys, True)]
+    for suffix, suffix_keys in sorted(om_keys.items()):
+        blocks.append((
+            metric.name + suffix,
+            f"# HELP {metric.name}{suffix} {documentation}\n"
+            f"# TYPE {metric.name}{suffix} gauge\n",
+            suffix_keys,
+            False,
+        ))
+    return blocks
+
+
+class SeriesTracker:  # pylint: disable=too-many-instance-attributes
+    """
+    Tracks the series of successive registry snapshots and renders full or delta output.
+
+    Generation tokens have the form "<instance>-<generation>". A token of another exporter
+    instance, an unparsable token, or one older than the retained removal history gets the
+    full snapshot.
+    """
+
+    def __init__(self, removed_history=1000):
+        self.instance = uuid.uuid4().hex[:12]
+        self.generation = 0
+        self.removed_history = removed_history
+        self._lock = threading.Lock()
+        self._fragments = {}
+        self._changed = {}
+        self._removed = {}
+        self._horizon = 0
+        self._blocks = []
+        self._layout = 0
+        self._selections = {}
+
+    @property
+    def token(self):
+        """
+        The generation token of the latest snapshot.
+        """
+        return f"{self.instance}-{self.generation}"
+
+    def _parse_token(self, token):
+        """
+        Returns the generation of a token, or None when the full snapshot is needed.
+        """
+        if not token:
+            return None
+        instance, _, generation = token.rpartition("-")
+        if instance != self.instance or not generation.isdigit():
+            return None
+        generation = int(generation)
+        if generation < self._horizon or generation > self.generation:
+            return None
+        return generation
+
+    def _update(self, registry):
+        """
+        Diffs the registry against the previous snapshot and advances the generation.
+        """
+        next_generation = self.generation + 1
+        blocks = []
+        seen = set()
+        changed = layout_changed = False
+        for metric in registry.collect():
+            keys, om_keys, family_changed, added = self._diff_samples(
+                metric, next_generation, seen
+            )
+            blocks.extend(family_blocks(metric, keys, om_keys))
+            changed = changed or family_changed
+            layout_changed = layout_changed or added
+
+        for key in [key for key in self._fragments if key not in seen]:
+            del self._fragments[key]
+            del self._changed[key]
+            self._removed[key] = next_generation
+            changed = layout_changed = True
+
+        if layout_changed or len(blocks) != len(self._blocks):
+            self._layout += 1
+        self._blocks = blocks
+        if changed:
+            self.generation = next_generation
+            self._prune_removed()
+
+    def _diff_samples(self, metric, next_generation, seen):
+        """
+        Diffs the samples of a metric family, rendering the new and changed series.
+
+        :return: A tuple of (keys of the family samples, dictionary of OpenMetrics suffix to
+            keys of its samples, whether a series changed, whether a series was added).
+        """
+        keys = []
+        om_keys = {}
+        changed = added = False
+        for sample in metric.samples:
+            key = (sample.name, tuple(sorted(sample.labels.items())))
+            seen.add(key)
+            for suffix in OM_SUFFIXES:
+                if sample.name == metric.name + suffix:
+                    om_keys.setdefault(suffix, []).append(key)
+                    break
+            else:
+                keys.append(key)
+
+            fragment = self._fragments.get(key)
+            if (
+                fragment is not None
+                and same_value(fragment[0], sample.value)
+                and fragment[1] == sample.timestamp
+            ):
+                continue
+            added = added or fragment is None
+            self._fragments[key] = (
+                sample.value,
+                sample.timestamp,
+                render_series(key[0], key[1], sample.value, sample.timestamp),
+            )
+            self._changed[key] = next_generation
+            self._removed.pop(key, None)
+            changed = True
+        return keys, om_keys, changed, added
+
+    def _prune_removed(self):
+        """
+        Forgets removals older than removed_history generations.
+        """
+        cutoff = self.generation - self.removed_history
+        if cutoff <= self._horizon:
+            return
+        self._removed = {
+            key: generation for key, generation in self._removed.items() if generation > cutoff
+        }
+        self._horizon = cutoff
+
+    def _render(self, since, blocks, series_filter=None):
+        """
+        Renders the series of blocks changed after a generation, or all of them when it is
+        None.
+        """
+        output = []
+        for _, headers, keys, family in blocks:
+            lines = [
+                self._fragments[key][2]
+                for key in keys
+                if since is None or self._changed[key] > since
+            ]
+            if lines or (family and since is None):
+                output.append(headers)
+                output.extend(lines)
+        if since is not None:
+            for (name, labels), generation in self._removed.items():
+                if generation > since and (
+                    series_filter is None or series_filter.selects(name, name, labels)
+                ):
+                    output.append(f"# REMOVED {render_series_name(name, labels)}\n")
+        return "".join(output).encode("utf-8")
+
+    def _select(self, series_filter):
+        """
+        Returns the cache entry of a filter, [layout, selected blocks, generation, content],
+        selecting the series again when they were added or removed.
+        """
+        entry = self._selections.pop(series_filter.key, None)
+        if entry is None or entry[0] != self._layout:
+            blocks = []
+            for name, headers, keys, _ in self._blocks:
+                selected = [key for key in keys if series_filter.selects(name, *key)]
+                if selected:
+                    blocks.append((name, headers, selected, False))
+            entry = [self._layout, blocks, None, None]
+        if len(self._selections) >= MAX_CACHED_SELECTIONS:
+            del self._selections[next(iter(self._selections))]
+        self._selections[series_filter.key] = entry
+        return entry
+
+    def snapshot(self, registry, since=None, series_filter=None):
+        """
+        Records a new registry snapshot and renders it.
+
+        :param registry: The CollectorRegistry holding the collected metrics.
+        :param since: A generation token; only the series changed after it are rendered,
+            followed by a "# REMOVED <series>" comment line per removed series.
+        :param series_filter: An optional SeriesFilter restricting the rendered series.
+            Families without selected series are left out.
+        :return: A tuple of (text exposition bytes, generation token).
+        """
+        content, token, _ = self.delta(registry, since, series_filter)
+        return content, token
+
+    def delta(self, registry, since, series_filter=None):
+        """
+        Records a new registry snapshot and renders it like snapshot(), telling whether the
+        since token was honoured.
+
+        :return: A tuple of (text exposition bytes, generation token, whether only the
+            series changed after the since token were rendered rather than all of them).
+        """
+        with self._lock:
+            since_generation = self._parse_token(since)
+            self._update(registry)
+            if series_filter is None:
+                content = self._render(since_generation, self._blocks)
+                return content, self.token, since_generation is not None
+
+            entry = self._select(series_filter)
+            if since_generation is not None:
+                content = self._render(since_generation, entry[1], series_filter)
+                return content, self.token, True
+            generation = max(
+                (self._changed[key] for _, _, keys, _ in entry[1] for key in keys), default=0
+            )
+            if entry[2] != generation:
+                entry[2], entry[3] = generation, self._render(None, entry[1])
+            return entry[3], self.token, False
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+series_filter - federate-style selection of the series to render
+
+A SeriesFilter selects series by family name (name[]=ee_task_cpu_limit), by Prometheus
+series selector (match[]={__name__=~"ee_task_.*"} or
+match[]=ee_container_memory_usage_byte{container_name="app"}), and by container name
+(container=app). A series is selected when it matches any name or selector, or when
+none is given, and when it belongs to one of the given containers, or none is given.
+
+Selectors support the label matchers =, !=, =~ and !~. As in Prometheus, regular
+expressions are fully anchored and a missing label matches as the empty string.
+"""
+
+import re
+from functools import lru_cache
+
+METRIC_NAME = re.compile(r"\s*([a-zA-Z_:][a-zA-Z0-9_:]*)?\s*")
+MATCHER = re.compile(
+    r"\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*"
+    r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')\s*(,?)"
+)
+ESCAPE = re.compile(r"\\(.)")
+ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+
+def unquote(string):
+    """
+    Returns the value of a quoted selector string.
+    """
+    return ESCAPE.sub(lambda m: ESCAPES.get(m.group(1), m.group(1)), string[1:-1])
+
+
+def parse_selector(selector):
+    """
+    Parses a series selector.
+
+    :param selector: The selector, metric_name{label="value",...} with an optional name.
+    :return: A tuple of (label name, operator, value or compiled regular expression)
+        matchers, the metric name being matched as the __name__ label.
+    :raises ValueError: If the selector is invalid or empty.
+    """
+    match = METRIC_NAME.match(selector)
+    matchers = []
+    if match.group(1):
+        matchers.append(("__name__", "=", match.group(1)))
+    position = match.end()
+    if selector.startswith("{", position):
+        position += 1
+        while True:
+            match = MATCHER.match(selector, position)
+            if match is None:
+                break
+            name, operator, value, comma = match.groups()
+            value = unquote(value)
+            if operator in ("=~", "!~"):
+                try:
+                    value = re.compile(value)
+                except re.error as e:
+                    raise ValueError(f"Invalid regular expression in {selector!r}: {e}") from e
+            matchers.append((name, operator, value))
+            position = match.end()
+            if not comma:
+                break
+        position = len(selector) - len(selector[position:].lstrip())
+        if not selector.startswith("}", position):
+            raise ValueError(f"Invalid series selector {selector!r}")
+        position += 1
+    if selector[position:].strip() or not matchers:
+        raise ValueError(f"Invalid series selector {selector!r}")
+    return tuple(matchers)
+
+
+def matches(matchers, name, labels):
+    """
+    Returns whether a series matches all the matchers of a selector.
+
+    :param matchers: The matchers returned by parse_selector().
+    :param name: The sample name.
+    :param labels: A dictionary of label name to value.
+    """
+    for label, operator, expected in matchers:
+        value = name if label == "__name__" else labels.get(label, "")
+        if operator == "=":
+            matched = value == expected
+        elif operator == "!=":
+            matched = value != expected
+        elif operator == "=~":
+            matched = expected.fullmatch(value) is not None
+        else:
+            matched = expected.fullmatch(value) is None
+        if not matched:
+            return False
+    return True
+
+
+class SeriesFilter:  # pylint: disable=too-few-public-methods
+    """
+    Selects the series of a snapshot by family name, series selector and container.
+    """
+
+    def __init__(self, names=(), selectors=(), containers=()):
+        """
+        :param names: Metric family names, as in the HELP and TYPE lines.
+        :param selectors: Prometheus series selectors.
+        :param containers: Values of the container_name label.
+        :raises ValueError: If a selector is invalid.
+        """
+        self.key = (tuple(sorted(names)), tuple(sorted(selectors)), tuple(sorted(containers)))
+        self.names = frozenset(names)
+        self.selectors = [parse_selector(selector) for selector in selectors]
+        self.containers = frozenset(containers)
+
+    def selects(self, family, name, labels):
+        """
+        Returns whether a series is selected.
+
+        :param family: The metric family name.
+        :param name: The sample name.
+        :param labels: A sorted tuple of (label name, label value) pairs.
+        """
+        labels = dict(labels)
+        if self.containers and labels.get("container_name") not in self.containers:
+            return False
+        if not self.names and not self.selectors:
+            return True
+        return family in self.names or any(
+            matches(selector, name, labels) for selector in self.selectors
+        )
+
+
+@lru_cache(maxsize=128)
+def get_series_filter(names=(), selectors=(), containers=()):
+    """
+    Returns the SeriesFilter of query parameters, or None when they select every series.
+
+    :param names: A tuple of the name[] parameters.
+    :param selectors: A tuple of the match[] parameters.
+    :param containers: A tuple of the container parameters.
+    :raises ValueError: If a selector is invalid.
+    """
+    if not names and not selectors and not containers:
+        return None
+    return SeriesFilter(names, selectors, containers)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+shared_snapshot - rendered responses shared between processes through a memory map
+
+One writer process publishes a set of payloads, such as the rendered /metrics text and
+the /stats and /task JSON, into a memory-mapped file. Any number of reader processes map
+the same file and serve the payloads without fetching or rendering anything themselves.
+
+The file starts with a generation counter followed by two slots. A write goes to the
+slot the current generation does not use and then bumps the counter, so the slot of the
+current generation is never modified. A reader copies the slot of the generation it read
+and checks that the counter did not move meanwhile, retrying otherwise. Readers keep the
+copy until the generation changes, so a scrape normally costs one 8 byte read of the
+shared memory.
+"""
+
+import mmap
+import os
+import struct
+
+HEADER = struct.Struct("<Q")
+LENGTH = struct.Struct("<Q")
+DEFAULT_SNAPSHOT_SIZE = 8 * 1024 * 1024
+READ_ATTEMPTS = 100
+
+
+class SnapshotTooLarge(ValueError):
+    """
+    Raised when the payloads of a snapshot do not fit in a slot.
+    """
+
+
+def slot_offset(size, generation):
+    """
+    Returns the offset of the slot used by a generation.
+
+    :param size: The size of the snapshot file.
+    :param generation: The generation.
+    :return: The offset in bytes.
+    """
+    return HEADER.size + (generation % 2) * ((size - HEADER.size) // 2)
+
+
+class SharedSnapshotWriter:
+    """
+    Publishes snapshots into a memory-mapped file.
+    """
+
+    def __init__(self, path, size=DEFAULT_SNAPSHOT_SIZE):
+        """
+        :param path: The path of the snapshot file, preferably on a tmpfs like /dev/shm.
+        :param size: The size of the snapshot file in bytes, split in two slots.
+        """
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.size = size
+        self.generation = 0
+
+    def write(self, *payloads):
+        """
+        Publishes a new snapshot.
+
+        :param payloads: The payloads as bytes.
+        :return: The generation of the snapshot.
+        :raises SnapshotTooLarge: If the payloads do not fit in a slot.
+        """
+        generation = self.generation + 1
+        offset = slot_offset(self.size, generation)
+        needed = LENGTH.size * (len(payloads) + 1) + sum(len(payload) for payload in payloads)
+        slot_size = (self.size - HEADER.size) // 2
+        if needed > slot_size:
+            raise SnapshotTooLarge(
+                f"Snapshot of {needed} bytes does not fit in a slot of {slot_size} bytes"
+            )
+        LENGTH.pack_into(self._mmap, offset, len(payloads))
+        offset += LENGTH.size
+        for payload in payloads:
+            LENGTH.pack_into(self._mmap, offset, len(payload))
+            self._mmap[offset + LENGTH.size:offset + LENGTH.size + len(payload)] = payload
+            offset += LENGTH.size + len(payload)
+        HEADER.pack_into(self._mmap, 0, generation)
+        self.generation = generation
+        return generation
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+        """
+        self._mmap.close()
+
+
+class SharedSnapshotReader:
+    """
+    Reads the latest snapshot published by a SharedSnapshotWriter.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The path of the snapshot file.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._mmap)
+        self._generation = 0
+        self._payloads = ()
+
+    def read(self):
+        """
+        Returns the latest snapshot.
+
+        :return: A tuple of (generation, payloads), generation 0 and no payloads before the
+            first write.
+        :raises RuntimeError: If the writer kept replacing the slot being read.
+        """
+        for _ in range(READ_ATTEMPTS):
+            (generation,) = HEADER.unpack_from(self._mmap, 0)
+            if generation == self._generation:
+                return generation, self._payloads
+            try:
+                payloads = self._copy(generation)
+            except struct.error:
+                continue
+            if HEADER.unpack_from(self._mmap, 0)[0] == generation:
+                self._generation, self._payloads = generation, payloads
+                return generation, payloads
+        raise RuntimeError("Snapshot kept changing while being read")
+
+    def _copy(self, generation):
+        """
+        Copies the payloads of the slot of a generation.
+        """
+        offset = slot_offset(self.size, generation)
+        (count,) = LENGTH.unpack_from(self._mmap, offset)
+        offset += LENGTH.size
+        payloads = []
+        for _ in range(min(count, self.size)):
+            (length,) = LENGTH.unpack_from(self._mmap, offset)
+            offset += LENGTH.size
+            payloads.append(self._mmap[offset:offset + length])
+            offset += length
+        return tuple(payloads)
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+        """
+        self._mmap.close()
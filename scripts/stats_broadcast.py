@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+stats_broadcast - fans out live task statistics to streaming subscribers
+
+A single poller fetches the statistics while at least one subscriber is connected,
+serialises each sample once and publishes it to every subscriber, so the load on the
+stats source does not depend on the number of viewers. Each subscriber has a bounded
+queue, and a slow subscriber loses its oldest samples instead of holding the others back.
+"""
+
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def frame_sse(payload):
+    """
+    Frames a JSON payload as a Server-Sent Events message.
+
+    :param payload: The JSON encoded sample.
+    :return: The SSE message bytes.
+    """
+    return b"data: " + payload + b"\n\n"
+
+
+def frame_ndjson(payload):
+    """
+    Frames a JSON payload as a newline delimited JSON line.
+
+    :param payload: The JSON encoded sample.
+    :return: The NDJSON line bytes.
+    """
+    return payload + b"\n"
+
+
+class StatsBroadcaster:
+    """
+    Polls statistics once per interval and publishes them to all subscribers.
+    """
+
+    def __init__(self, fetch, interval=1.0, queue_size=4):
+        """
+        :param fetch: A blocking callable returning a JSON serialisable sample.
+        :param interval: The polling interval in seconds.
+        :param queue_size: The number of samples buffered per subscriber.
+        """
+        self.fetch = fetch
+        self.interval = interval
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._subscribers = set()
+        self._latest = None
+        self._poller = None
+
+    @property
+    def subscriber_count(self):
+        """
+        The number of connected subscribers.
+        """
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """
+        Registers a subscriber and starts the poller if it is not running.
+
+        :return: The asyncio.Queue the samples of the subscriber are published to.
+        """
+        subscriber = asyncio.Queue(maxsize=self.queue_size)
+        if self._latest is not None:
+            subscriber.put_nowait(self._latest)
+        self._subscribers.add(subscriber)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """
+        Removes a subscriber. The poller stops after its last subscriber is gone.
+
+        :param subscriber: The queue returned by subscribe().
+        """
+        self._subscribers.discard(subscriber)
+
+    def publish(self, payload):
+        """
+        Publishes a serialised sample to every subscriber, dropping their oldest on overflow.
+
+        :param payload: The JSON encoded sample.
+        """
+        self._latest = payload
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()
+                self.dropped += 1
+            subscriber.put_nowait(payload)
+
+    async def _poll(self):
+        """
+        Fetches and publishes a sample per interval while there are subscribers.
+        """
+        while self._subscribers:
+            try:
+                sample = await asyncio.to_thread(self.fetch)
+                self.publish(json.dumps(sample).encode("utf-8"))
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Any failure ending the poller would leave the subscribers waiting forever
+                logger.exception("Failed to fetch stats for streaming")
+            await asyncio.sleep(self.interval)
+        self._latest = None
+
+    async def stream(self, frame):
+        """
+        Yields the framed samples of a new subscriber until the consumer goes away.
+
+        :param frame: A function framing a JSON payload for the wire format.
+        """
+        subscriber = self.subscribe()
+        try:
+            while True:
+                yield frame(await subscriber.get())
+        finally:
+            self.unsubscribe(subscriber)
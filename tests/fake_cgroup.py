@@ -0,0 +1,99 @@
+"""
+Fake cgroup and proc trees on disk for testing the cgroup reader.
+"""
+
+import os
+
+SAMPLE_VALUES = {
+    "cpu_ns": 1234567000,
+    "memory_usage": 30000000,
+    "memory_cache": 10000000,
+    "read_bytes": 100,
+    "write_bytes": 200,
+    "read_ops": 10,
+    "write_ops": 20,
+}
+
+NET_DEV = (
+    "Inter-|   Receive                                                |  Transmit\n"
+    " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets"
+    " errs drop fifo colls carrier compressed\n"
+    "    lo:    9999      10    0    0    0     0          0         0     9999      10"
+    "    0    0    0     0       0          0\n"
+    "  eth1:     {rx}      20    0    0    0     0          0         0      {tx}      30"
+    "    0    0    0     0       0          0\n"
+)
+
+
+def write_file(path, content):
+    """
+    Writes a file, creating its parent directories.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="ascii") as f:
+        f.write(content)
+
+
+def write_proc(proc_root, pid, rx_bytes, tx_bytes):
+    """
+    Writes /proc/<pid>/net/dev.
+    """
+    write_file(
+        os.path.join(proc_root, str(pid), "net", "dev"),
+        NET_DEV.format(rx=rx_bytes, tx=tx_bytes),
+    )
+
+
+def write_v1_container(cgroup_root, docker_id, pid, values):
+    """
+    Writes the cgroup v1 accounting files of a container.
+
+    values keys: cpu_ns, memory_usage, memory_cache, read_bytes, write_bytes,
+    read_ops, write_ops.
+    """
+    cpu_dir = os.path.join(cgroup_root, "cpu,cpuacct", "ecs", "task", docker_id)
+    memory_dir = os.path.join(cgroup_root, "memory", "ecs", "task", docker_id)
+    blkio_dir = os.path.join(cgroup_root, "blkio", "ecs", "task", docker_id)
+
+    write_file(os.path.join(cpu_dir, "cpuacct.usage"), f"{values['cpu_ns']}\n")
+    write_file(os.path.join(memory_dir, "memory.usage_in_bytes"), f"{values['memory_usage']}\n")
+    write_file(
+        os.path.join(memory_dir, "memory.stat"),
+        f"cache {values['memory_cache']}\nrss 1234\n",
+    )
+    write_file(os.path.join(memory_dir, "cgroup.procs"), f"{pid}\n")
+    write_file(
+        os.path.join(blkio_dir, "blkio.throttle.io_service_bytes_recursive"),
+        f"254:0 Read {values['read_bytes']}\n254:0 Write {values['write_bytes']}\n"
+        f"254:0 Sync 0\n254:0 Async 0\n254:0 Total 0\nTotal 0\n",
+    )
+    write_file(
+        os.path.join(blkio_dir, "blkio.throttle.io_serviced_recursive"),
+        f"254:0 Read {values['read_ops']}\n254:0 Write {values['write_ops']}\nTotal 0\n",
+    )
+
+
+def write_v2_container(cgroup_root, docker_id, pid, values):
+    """
+    Writes the cgroup v2 accounting files of a container.
+
+    values keys are the same as write_v1_container.
+    """
+    write_file(os.path.join(cgroup_root, "cgroup.controllers"), "cpu io memory pids\n")
+    container_dir = os.path.join(cgroup_root, "system.slice", f"docker-{docker_id}.scope")
+
+    write_file(
+        os.path.join(container_dir, "cpu.stat"),
+        f"usage_usec {values['cpu_ns'] // 1000}\nuser_usec 0\nsystem_usec 0\n",
+    )
+    write_file(os.path.join(container_dir, "memory.current"), f"{values['memory_usage']}\n")
+    write_file(
+        os.path.join(container_dir, "memory.stat"),
+        f"anon 1234\nfile {values['memory_cache']}\n",
+    )
+    write_file(os.path.join(container_dir, "cgroup.procs"), f"{pid}\n")
+    write_file(
+        os.path.join(container_dir, "io.stat"),
+        f"254:0 rbytes={values['read_bytes']} wbytes={values['write_bytes']} "
+        f"rios={values['read_ops']} wios={values['write_ops']} dbytes=0 dios=0\n",
+    )
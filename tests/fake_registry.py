@@ -0,0 +1,44 @@
+"""
+Fake collectors and registries for testing the rendering of collected metrics.
+"""
+
+from prometheus_client.core import CollectorRegistry
+
+from scripts.collector import create_metrics
+
+TASK_LABELS = {
+    "container_name": "_task_",
+    "container_id": "_task_",
+    "task_family": "family",
+    "task_revision": "1",
+}
+
+
+class StaticCollector:  # pylint: disable=too-few-public-methods
+    """
+    Collector of fixed metric families.
+    """
+
+    def __init__(self, families):
+        self.families = families
+
+    def collect(self):
+        """
+        Returns the metric families.
+        """
+        return self.families
+
+
+def build_registry(memory_bytes, containers=("app",)):
+    """
+    Builds a registry like a collection with the given memory usage per container.
+    """
+    registry = CollectorRegistry(auto_describe=False)
+    metrics = create_metrics(registry)
+    metrics["gauge_task_cpu_limit"].labels(**TASK_LABELS).set(0.5)
+    for name in containers:
+        labels = {**TASK_LABELS, "container_name": name, "container_id": "0123456789ab"}
+        metrics["gauge_mem_usage_total_bytes"].labels(**labels).set(memory_bytes)
+        metrics["counter_cpu_usage_sec"].labels(**labels).inc(1.5)
+    metrics["ecs_metrics_exporter_success"].set(1)
+    return registry
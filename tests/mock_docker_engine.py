@@ -0,0 +1,105 @@
+"""
+Mock Docker Engine API on a unix domain socket for testing the docker stats source.
+"""
+
+import copy
+import json
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from tests.mock_endpoint import test_json
+
+STATS_PATH = re.compile(r"^/containers/(?P<id>[^/]+)/stats\?stream=true$")
+
+
+class DockerEngineHandler(BaseHTTPRequestHandler):
+    """
+    Streams a stats sample per interval with an increasing cpu total_usage.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handles GET /containers/{id}/stats?stream=true.
+        """
+        match = STATS_PATH.match(self.path)
+        if match is None or match.group("id") not in test_json["stats"]:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.server.stream_requests.append(match.group("id"))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        sample = copy.deepcopy(test_json["stats"][match.group("id")])
+        sample["name"] = "/" + sample["name"]
+        if match.group("id") in self.server.without_networks:
+            del sample["networks"]
+        if match.group("id") in self.server.cgroup_v2:
+            blkio_stats = sample["blkio_stats"]
+            blkio_stats["io_service_bytes_recursive"] = [
+                {**blk_io, "op": blk_io["op"].lower()}
+                for blk_io in blkio_stats["io_service_bytes_recursive"]
+                if blk_io["op"] in ("Read", "Write")
+            ]
+            blkio_stats["io_serviced_recursive"] = None
+        try:
+            for _ in range(self.server.samples_per_stream):
+                sample["cpu_stats"]["cpu_usage"]["total_usage"] += 1000000000
+                chunk = json.dumps(sample).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                self.wfile.flush()
+                time.sleep(self.server.interval)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class MockDockerEngine(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded unix socket HTTP server emulating the Docker Engine stats stream.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, interval=0.05, samples_per_stream=1000,
+                 without_networks=(), cgroup_v2=()):
+        """
+        :param socket_path: The unix socket path to listen on.
+        :param interval: The interval in seconds between the samples of a stream.
+        :param samples_per_stream: The number of samples of a stream.
+        :param without_networks: The DockerIds whose samples have no networks, like those
+            of containers in the host or container: network modes.
+        :param cgroup_v2: The DockerIds whose samples have the block IO statistics of cgroup
+            v2 hosts: lowercase ops and a null io_serviced_recursive.
+        """
+        super().__init__(socket_path, DockerEngineHandler)
+        self.interval = interval
+        self.samples_per_stream = samples_per_stream
+        self.without_networks = frozenset(without_networks)
+        self.cgroup_v2 = frozenset(cgroup_v2)
+        self.stream_requests = []
+
+    def start(self):
+        """
+        Serves requests in a background thread.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """
+        Stops serving and closes the socket.
+        """
+        self.shutdown()
+        self.server_close()
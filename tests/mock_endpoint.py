@@ -2,6 +2,8 @@
 Mock endpoints for testing ECS metrics exporter.
 """
 
+import json
+
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 import uvicorn
@@ -421,6 +423,14 @@ test_json = {
 }
 
 
+def fake_fetch_bytes(url, _):
+    """
+    Returns the mock endpoint documents as JSON bytes instead of fetching them.
+    """
+    document = test_json["stats"] if url.endswith("/task/stats") else test_json["task"]
+    return json.dumps(document).encode("utf-8")
+
+
 @app.get("/task")
 async def task():
     """
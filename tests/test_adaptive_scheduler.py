@@ -0,0 +1,146 @@
+"""
+Unit tests for the scrape-aware scheduling of background collections.
+"""
+
+import unittest
+
+from prometheus_client.core import CollectorRegistry, CounterMetricFamily, GaugeMetricFamily
+
+from scripts.adaptive_scheduler import LEAD_MARGIN, AdaptiveScheduler, sample_values
+from tests.fake_registry import StaticCollector
+
+VALUES = {("ee_container_memory_usage_byte", (("container_name", "app"),)): 100.0}
+
+
+def changed_values(step):
+    """
+    Returns sample values that differ from those of the previous step.
+    """
+    return {key: value * 2**step for key, value in VALUES.items()}
+
+
+class TestAdaptiveScheduler(unittest.TestCase):
+    """
+    Test cases for timing the collections from the scrapes.
+    """
+
+    def setUp(self):
+        self.scheduler = AdaptiveScheduler(interval=5, idle_interval=60)
+
+    def collect(self, started, values, duration=0.2):
+        """
+        Records a collection of the given duration.
+        """
+        self.scheduler.record_collect(started, started + duration, values)
+
+    def test_idle_without_scrapes(self):
+        """
+        Test that nothing scraping collects once per idle interval.
+        """
+        self.assertEqual(self.scheduler.next_collect(0), 0)
+        self.collect(0, VALUES)
+        self.assertTrue(self.scheduler.idle(1))
+        self.assertAlmostEqual(self.scheduler.next_collect(1), 60.2)
+
+    def test_scrape_wakes_from_idle(self):
+        """
+        Test that the first scrape after an idle period collects right away.
+        """
+        self.collect(0, VALUES)
+        self.scheduler.record_scrape(30)
+        self.assertEqual(self.scheduler.next_collect(30), 30)
+        self.collect(30, changed_values(1))
+        self.assertFalse(self.scheduler.idle(31))
+        self.assertIsNone(self.scheduler.cadence)
+        self.assertAlmostEqual(self.scheduler.next_collect(31), 35.2)
+
+    def test_aligns_before_expected_scrapes(self):
+        """
+        Test that collections land just before the scrapes of the learned cadence.
+        """
+        for step, scrape in enumerate((100, 115, 130, 145)):
+            self.scheduler.record_scrape(scrape)
+            self.collect(scrape + 0.5, changed_values(step))
+        self.assertEqual(self.scheduler.cadence, 15)
+        self.assertAlmostEqual(self.scheduler.next_collect(146), 160 - 0.2 - LEAD_MARGIN)
+
+        self.collect(159.7, changed_values(5))
+        self.scheduler.record_scrape(160)
+        self.assertAlmostEqual(self.scheduler.next_collect(161), 175 - 0.2 - LEAD_MARGIN)
+
+    def test_static_values_back_off(self):
+        """
+        Test that unchanged values skip scrapes up to the idle interval, and that a change
+        collects before every scrape again.
+        """
+        for scrape in (100, 115, 130):
+            self.scheduler.record_scrape(scrape)
+            self.collect(scrape - 1, VALUES)
+        self.assertEqual(self.scheduler.stride, 4)
+        self.assertAlmostEqual(
+            self.scheduler.next_collect(131), 130 + 4 * 15 - 0.2 - LEAD_MARGIN
+        )
+
+        for _ in range(4):
+            self.collect(131, VALUES)
+        self.assertEqual(self.scheduler.stride, 4)
+
+        self.collect(131, changed_values(1))
+        self.assertEqual(self.scheduler.stride, 1)
+        self.collect(132, None)
+        self.assertEqual(self.scheduler.stride, 1)
+
+    def test_counter_increase_is_a_change(self):
+        """
+        Test that any counter increase is a change while gauges keep the tolerance.
+        """
+        counter = ("ee_container_cpu_usage_seconds_total", (("container_name", "app"),))
+        self.collect(0, {**VALUES, counter: 10000.0})
+        self.collect(5, {**VALUES, counter: 10000.0})
+        self.assertEqual(self.scheduler.stride, 2)
+        self.collect(10, {**VALUES, counter: 10003.75})
+        self.assertEqual(self.scheduler.stride, 1)
+
+        gauge_key = next(iter(VALUES))
+        self.collect(15, {gauge_key: 100.5, counter: 10003.75})
+        self.assertEqual(self.scheduler.stride, 2)
+
+    def test_merges_close_scrapes_and_ignores_long_gaps(self):
+        """
+        Test that scrapes within the merge window count once and that gaps longer than the
+        idle interval are not learned.
+        """
+        self.scheduler.record_scrape(100)
+        self.scheduler.record_scrape(100.3)
+        self.scheduler.record_scrape(110)
+        self.assertEqual(self.scheduler.cadence, 10)
+        self.scheduler.record_scrape(3700)
+        self.scheduler.record_scrape(3712)
+        self.assertEqual(self.scheduler.cadence, 11)
+
+
+class TestSampleValues(unittest.TestCase):
+    """
+    Test cases for the values of the change detection.
+    """
+
+    def test_volatile_samples_left_out(self):
+        """
+        Test that _created samples and the exporter's own metrics are left out.
+        """
+        counter = CounterMetricFamily("ee_container_cpu_usage_seconds", "", labels=["name"])
+        counter.add_metric(["app"], 1.5, created=10)
+        own = CounterMetricFamily("ecs_metrics_exporter_cpu_seconds", "", labels=["mode"])
+        own.add_metric(["user"], 0.1)
+        gauge = GaugeMetricFamily("ee_task_cpu_limit", "", value=0.5)
+        registry = CollectorRegistry(auto_describe=False)
+        registry.register(StaticCollector([counter, own, gauge]))
+
+        self.assertEqual(sample_values(registry), {
+            ("ee_container_cpu_usage_seconds_total", (("name", "app"),)): 1.5,
+            ("ee_task_cpu_limit", ()): 0.5,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
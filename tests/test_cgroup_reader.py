@@ -0,0 +1,238 @@
+"""
+Unit tests for the cgroup filesystem reader.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from scripts import cgroup_reader, collector
+from scripts.cgroup_reader import CgroupStatsReader
+from tests.fake_cgroup import SAMPLE_VALUES
+from tests.fake_cgroup import write_proc, write_v1_container, write_v2_container
+from tests.mock_endpoint import test_json
+
+CONTAINER_A = "49e756135b1849cf98cd6a12c78bc6ea-1059602171"
+CONTAINER_B = "49e756135b1849cf98cd6a12c78bc6ea-2485339635"
+
+VALUES_A = SAMPLE_VALUES
+VALUES_B = {
+    "cpu_ns": 2000000000,
+    "memory_usage": 5000000,
+    "memory_cache": 0,
+    "read_bytes": 1,
+    "write_bytes": 2,
+    "read_ops": 3,
+    "write_ops": 4,
+}
+
+
+class CgroupTreeMixin:
+    """
+    Builds a fake cgroup and proc tree in a temporary directory.
+
+    The test cases define write_container(docker_id, pid, values) for their hierarchy.
+    """
+
+    def setUp(self):  # pylint: disable=invalid-name
+        """
+        Writes the containers and opens a reader on the fake tree.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cgroup_root = os.path.join(self.tmpdir.name, "cgroup")
+        self.proc_root = os.path.join(self.tmpdir.name, "proc")
+        os.makedirs(self.cgroup_root)
+        self.write_container(CONTAINER_A, 100, VALUES_A)
+        self.write_container(CONTAINER_B, 200, VALUES_B)
+        write_proc(self.proc_root, 100, 1000, 2000)
+        write_proc(self.proc_root, 200, 1000, 2000)
+        self.reader = CgroupStatsReader(self.cgroup_root, self.proc_root)
+
+    def tearDown(self):  # pylint: disable=invalid-name
+        """
+        Closes the reader and removes the fake tree.
+        """
+        self.reader.close()
+        self.tmpdir.cleanup()
+
+    def assert_container_stat(self, container_stat, values):
+        """
+        Checks that a container stat matches the values written to the fake tree.
+        """
+        self.assertEqual(container_stat["cpu_stats"]["cpu_usage"]["total_usage"], values["cpu_ns"])
+        self.assertEqual(container_stat["memory_stats"]["usage"], values["memory_usage"])
+        blkio = container_stat["blkio_stats"]
+        self.assertIn(
+            {"major": 254, "minor": 0, "op": "Read", "value": values["read_bytes"]},
+            blkio["io_service_bytes_recursive"],
+        )
+        self.assertIn(
+            {"major": 254, "minor": 0, "op": "Write", "value": values["write_ops"]},
+            blkio["io_serviced_recursive"],
+        )
+        self.assertEqual(
+            container_stat["networks"], {"eth1": {"rx_bytes": 1000, "tx_bytes": 2000}}
+        )
+
+
+class TestCgroupV1Reader(CgroupTreeMixin, unittest.TestCase):
+    """
+    Test cases for reading cgroup v1 controllers.
+    """
+
+    def write_container(self, docker_id, pid, values):
+        """
+        Writes the accounting files of a container to the fake cgroup v1 tree.
+        """
+        write_v1_container(self.cgroup_root, docker_id, pid, values)
+
+    def test_read_stats(self):
+        """
+        Test that the v1 accounting files are mapped to the Docker stats format.
+        """
+        self.assertFalse(self.reader.unified)
+        stats = self.reader.read_stats(test_json["task"]["Containers"])
+        self.assertEqual(set(stats), {CONTAINER_A, CONTAINER_B})
+        self.assert_container_stat(stats[CONTAINER_A], VALUES_A)
+        self.assert_container_stat(stats[CONTAINER_B], VALUES_B)
+        self.assertEqual(stats[CONTAINER_A]["name"], "containerA")
+        self.assertEqual(stats[CONTAINER_A]["memory_stats"]["stats"]["cache"], 10000000)
+
+    def test_file_handles_are_reused(self):
+        """
+        Test that repeated reads reuse the file descriptors and see updated values.
+        """
+        self.reader.read_stats(test_json["task"]["Containers"])
+        fds = dict(self.reader._fds)  # pylint: disable=protected-access
+
+        self.write_container(CONTAINER_A, 100, {**VALUES_A, "cpu_ns": 5000000000})
+        stats = self.reader.read_stats(test_json["task"]["Containers"])
+
+        self.assertEqual(self.reader._fds, fds)  # pylint: disable=protected-access
+        self.assertEqual(stats[CONTAINER_A]["cpu_stats"]["cpu_usage"]["total_usage"], 5000000000)
+
+    def test_invisible_container_is_skipped(self):
+        """
+        Test that containers without a visible cgroup are skipped.
+        """
+        containers = test_json["task"]["Containers"] + [{"DockerId": "unknown", "Name": "x"}]
+        stats = self.reader.read_stats(containers)
+        self.assertNotIn("unknown", stats)
+
+    def test_missing_container_is_not_searched_every_read(self):
+        """
+        Test that the hierarchy is walked again for a missing container only after the
+        retry interval.
+        """
+        containers = [{"DockerId": "unknown", "Name": "x"}]
+        with mock.patch.object(
+            cgroup_reader, "find_container_dir", return_value=None
+        ) as find_container_dir:
+            self.reader.read_stats(containers)
+            calls = find_container_dir.call_count
+            self.reader.read_stats(containers)
+            self.assertEqual(find_container_dir.call_count, calls)
+
+            with mock.patch.object(cgroup_reader.time, "monotonic", return_value=1e12):
+                self.reader.read_stats(containers)
+            self.assertGreater(find_container_dir.call_count, calls)
+
+    def test_exited_container_is_forgotten(self):
+        """
+        Test that a container whose cgroup disappears is skipped and its files closed.
+        """
+        self.reader.read_stats(test_json["task"]["Containers"])
+        for controller in ("cpu,cpuacct", "memory", "blkio"):
+            shutil.rmtree(os.path.join(self.cgroup_root, controller, "ecs", "task", CONTAINER_B))
+
+        # The files of a removed cgroup fail to read through their open descriptors
+        removed = {
+            fd for path, fd in self.reader._fds.items()  # pylint: disable=protected-access
+            if CONTAINER_B in path
+        }
+        pread = os.pread
+
+        def removed_cgroup_pread(fd, size, offset):
+            if fd in removed:
+                raise OSError(errno.ENODEV, os.strerror(errno.ENODEV))
+            return pread(fd, size, offset)
+
+        with mock.patch.object(cgroup_reader.os, "pread", side_effect=removed_cgroup_pread):
+            stats = self.reader.read_stats(test_json["task"]["Containers"])
+        self.assertEqual(set(stats), {CONTAINER_A})
+        self.assertFalse(any(
+            CONTAINER_B in path for path in self.reader._fds  # pylint: disable=protected-access
+        ))
+        self.assertNotIn(
+            os.path.join(self.proc_root, "200", "net", "dev"),
+            self.reader._fds,  # pylint: disable=protected-access
+        )
+        self.assert_container_stat(stats[CONTAINER_A], VALUES_A)
+
+    def test_net_dev_follows_first_process(self):
+        """
+        Test that the network counters file is replaced when the first process changes.
+        """
+        self.reader.read_stats(test_json["task"]["Containers"])
+        write_proc(self.proc_root, 300, 1000, 2000)
+        self.write_container(CONTAINER_A, 300, VALUES_A)
+        stats = self.reader.read_stats(test_json["task"]["Containers"])
+
+        fds = self.reader._fds  # pylint: disable=protected-access
+        self.assertNotIn(os.path.join(self.proc_root, "100", "net", "dev"), fds)
+        self.assertIn(os.path.join(self.proc_root, "300", "net", "dev"), fds)
+        self.assert_container_stat(stats[CONTAINER_A], VALUES_A)
+
+
+class TestCgroupV2Reader(CgroupTreeMixin, unittest.TestCase):
+    """
+    Test cases for reading the cgroup v2 unified hierarchy.
+    """
+
+    def write_container(self, docker_id, pid, values):
+        """
+        Writes the accounting files of a container to the fake cgroup v2 tree.
+        """
+        write_v2_container(self.cgroup_root, docker_id, pid, values)
+
+    def test_read_stats(self):
+        """
+        Test that the v2 accounting files are mapped to the Docker stats format.
+        """
+        self.assertTrue(self.reader.unified)
+        stats = self.reader.read_stats(test_json["task"]["Containers"])
+        self.assert_container_stat(stats[CONTAINER_A], VALUES_A)
+        self.assert_container_stat(stats[CONTAINER_B], VALUES_B)
+
+    def test_metrics_from_cgroup_source(self):
+        """
+        Test that /metrics output is rendered from the cgroup source.
+        """
+        env = {
+            "ECS_CONTAINER_METADATA_URI_V4": "http://metadata",
+            "ECS_METRICS_EXPORTER_STATS_SOURCE": "cgroup",
+            "ECS_METRICS_EXPORTER_CGROUP_ROOT": self.cgroup_root,
+            "ECS_METRICS_EXPORTER_PROC_ROOT": self.proc_root,
+        }
+        collector.get_counter_offsets.cache_clear()
+        with mock.patch.dict(os.environ, env), mock.patch(
+            "scripts.collector.fetch_json", return_value=test_json["task"]
+        ) as fetch_json:
+            content = collector.collect_ecs_task_metadata().decode("utf-8")
+
+        fetch_json.assert_called_once_with("http://metadata/task", "task metadata")
+        self.assertIn("ecs_metrics_exporter_success 1", content)
+        self.assertRegex(
+            content,
+            r'ee_container_cpu_usage_seconds_total{container_id="_task_",[^}]*} 3\.234567',
+        )
+        self.assertRegex(
+            content, r'ee_container_block_io_write_ops{container_id="_task_",[^}]*} 24\.0'
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Unit tests for the columnar aggregation of container samples.
+"""
+
+import random
+import unittest
+from unittest import mock
+
+from scripts import columnar
+from scripts.columnar import ContainerSamples
+
+COLUMNS = ("memory", "network", "started_at")
+
+
+def build_samples(rows, vectorized):
+    """
+    Builds samples from (group, values) rows.
+    """
+    samples = ContainerSamples(COLUMNS, vectorized=vectorized)
+    for group, values in rows:
+        samples.append(group, values)
+    return samples
+
+
+def accumulate(rows):
+    """
+    Aggregates rows one at a time, like the accumulators of the collection loop.
+    """
+    result = {}
+    for group, (memory, network, started_at) in rows:
+        aggregates = result.setdefault(group, {"memory": 0, "network": 0, "started_at": 0})
+        aggregates["memory"] += memory
+        aggregates["network"] += network
+        aggregates["started_at"] = max(aggregates["started_at"], started_at)
+    return result
+
+
+class TestContainerSamples(unittest.TestCase):
+    """
+    Test cases for the loop and the NumPy aggregations.
+    """
+
+    def setUp(self):
+        rng = random.Random(34)
+        self.rows = [
+            (
+                f"family-{rng.randrange(5)}",
+                (rng.randrange(2**40), rng.randrange(2**20), rng.uniform(1.6e9, 1.7e9)),
+            )
+            for _ in range(500)
+        ]
+
+    def check(self, rows):
+        """
+        Checks that every aggregation matches the accumulators, values and types.
+        """
+        expected = accumulate(rows)
+        vectorized_options = (False, True) if columnar.get_numpy() is not None else (False,)
+        for vectorized in vectorized_options:
+            with self.subTest(vectorized=vectorized):
+                result = build_samples(rows, vectorized).aggregate(
+                    ("memory", "network"), ("started_at",)
+                )
+                self.assertEqual(result, expected)
+                self.assertEqual(list(result), list(expected))
+                for group, aggregates in result.items():
+                    for name, value in aggregates.items():
+                        self.assertIs(type(value), type(expected[group][name]))
+
+    def test_group_by(self):
+        """
+        Test sums and maxima per group in first appearance order.
+        """
+        self.check(self.rows)
+
+    def test_single_group(self):
+        """
+        Test the task level aggregation of a single group.
+        """
+        self.check([(None, values) for _, values in self.rows])
+
+    def test_overflowing_and_float_sums(self):
+        """
+        Test that sums which do not fit 64 bits or add floats stay exact.
+        """
+        self.check([("a", (2**62, 0.1, 1.0)), ("a", (2**62, 0.2, 2.0)), ("b", (2**70, 0.3, 0))])
+
+    def test_empty(self):
+        """
+        Test that no rows give no groups.
+        """
+        self.assertEqual(ContainerSamples(COLUMNS).aggregate(("memory",)), {})
+
+    def test_numpy_not_loaded_for_few_rows(self):
+        """
+        Test that NumPy is not imported below VECTORIZE_MIN_ROWS rows.
+        """
+        with mock.patch.object(columnar, "get_numpy") as get_numpy:
+            build_samples(self.rows[:10], None).aggregate(("memory",))
+        get_numpy.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
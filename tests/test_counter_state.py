@@ -0,0 +1,137 @@
+"""
+Unit tests for counter continuity across restarts.
+"""
+
+import copy
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from scripts import collector
+from scripts.counter_state import EVICT_AFTER_FLUSHES, CounterOffsets
+from tests.mock_endpoint import test_json
+
+CONTAINER_A = "49e756135b1849cf98cd6a12c78bc6ea-1059602171"
+REPLACEMENT_A = "9f3c2a7be41d4e0c8a6b5d2e1f0a9b8c7d6e5f4a3b2c1d0e9f8a7b6c5d4e3f2a"
+
+
+class TestCounterOffsets(unittest.TestCase):
+    """
+    Test cases for reset detection and state persistence.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.state_file = os.path.join(self.tmpdir.name, "state")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_container_restart(self):
+        """
+        Test that a new DockerId or StartedAt continues from the last value.
+        """
+        offsets = CounterOffsets()
+        self.assertEqual(offsets.continuous("a", "id1", 10, 5.0), 5.0)
+        self.assertEqual(offsets.continuous("a", "id1", 10, 7.0), 7.0)
+        self.assertEqual(offsets.continuous("a", "id2", 20, 1.0), 8.0)
+        self.assertEqual(offsets.continuous("a", "id2", 30, 2.0), 10.0)
+        self.assertEqual(offsets.continuous("b", "id3", 10, 3.0), 3.0)
+
+    def test_value_going_backwards(self):
+        """
+        Test that a decreasing value of the same container is treated as a reset.
+        """
+        offsets = CounterOffsets()
+        offsets.continuous("a", "id1", 10, 5.0)
+        self.assertEqual(offsets.continuous("a", "id1", 10, 1.0), 6.0)
+
+    def test_exporter_restart(self):
+        """
+        Test that the offsets survive an exporter restart through the state file.
+        """
+        offsets = CounterOffsets(self.state_file)
+        offsets.continuous("a", "id1", 10, 5.0)
+        offsets.continuous("a", "id2", 20, 1.0)
+        offsets.close()
+
+        restarted = CounterOffsets(self.state_file)
+        self.assertEqual(restarted.continuous("a", "id2", 20, 2.0), 7.0)
+        self.assertEqual(restarted.continuous("a", "id3", 30, 1.0), 8.0)
+        restarted.close()
+
+    def test_sum_does_not_go_backwards(self):
+        """
+        Test that a sum keeps its value when a member disappears and increases with the rest.
+        """
+        offsets = CounterOffsets()
+        self.assertEqual(offsets.monotonic("task", 5.0), 5.0)
+        self.assertEqual(offsets.monotonic("task", 3.0), 5.0)
+        self.assertEqual(offsets.monotonic("task", 4.0), 6.0)
+
+    def test_unseen_entries_are_evicted(self):
+        """
+        Test that the entries not used for EVICT_AFTER_FLUSHES flushes are forgotten.
+        """
+        offsets = CounterOffsets(self.state_file)
+        offsets.continuous("a", "id1", 10, 5.0)
+        offsets.continuous("b", "id2", 10, 5.0)
+        offsets.flush()
+        for _ in range(EVICT_AFTER_FLUSHES - 1):
+            offsets.continuous("a", "id1", 10, 5.0)
+            offsets.flush()
+            self.assertIn("b", offsets._entries)  # pylint: disable=protected-access
+        offsets.continuous("a", "id1", 10, 5.0)
+        offsets.close()
+
+        restarted = CounterOffsets(self.state_file)
+        self.assertEqual(set(restarted._entries), {"a"})  # pylint: disable=protected-access
+        restarted.close()
+
+    def test_corrupted_state_file(self):
+        """
+        Test that a corrupted state file is ignored.
+        """
+        with open(self.state_file, "wb") as f:
+            f.write(b"\x05\x00\x00\x00\x00\x00\x00\x00{{{{{")
+        offsets = CounterOffsets(self.state_file)
+        self.assertEqual(offsets.continuous("a", "id1", 10, 5.0), 5.0)
+        offsets.close()
+
+    def test_metrics_counter_is_continuous(self):
+        """
+        Test that ee_container_cpu_usage_seconds_total does not go backwards when a container
+        is replaced by one with another DockerId.
+        """
+        collector.get_counter_offsets.cache_clear()
+        task = copy.deepcopy(test_json["task"])
+        stats = copy.deepcopy(test_json["stats"])
+        with mock.patch.object(
+            collector, "fetch_task_metadata", return_value=(task, stats)
+        ):
+            collector.collect_ecs_task_metadata()
+
+            task["Containers"][0]["DockerId"] = REPLACEMENT_A
+            task["Containers"][0]["StartedAt"] = "2021-01-03T00:00:00Z"
+            stat = stats.pop(CONTAINER_A)
+            stat["id"] = REPLACEMENT_A
+            stat["cpu_stats"]["cpu_usage"]["total_usage"] = 500000000
+            stats[REPLACEMENT_A] = stat
+            content = collector.collect_ecs_task_metadata().decode("utf-8")
+        collector.get_counter_offsets.cache_clear()
+
+        self.assertRegex(
+            content,
+            r'ee_container_cpu_usage_seconds_total{container_id="9f3c2a7be41d",'
+            r'container_name="containerA"[^}]*} 1\.73456789\n',
+        )
+        self.assertRegex(
+            content,
+            r'ee_container_cpu_usage_seconds_total{[^}]*container_name="_task_"[^}]*}'
+            r' 1\.73456789\n',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
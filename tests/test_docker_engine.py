@@ -0,0 +1,174 @@
+"""
+Unit tests for the Docker Engine API stats source.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from scripts import collector
+from scripts.docker_engine import DockerStatsStreamer
+from tests.mock_docker_engine import MockDockerEngine
+from tests.mock_endpoint import test_json
+
+CONTAINER_A = "49e756135b1849cf98cd6a12c78bc6ea-1059602171"
+CONTAINER_B = "49e756135b1849cf98cd6a12c78bc6ea-2485339635"
+
+
+class TestDockerStatsStreamer(unittest.TestCase):
+    """
+    Test cases for streaming stats from a stand-in Docker Engine unix socket.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.socket_path = os.path.join(self.tmpdir.name, "docker.sock")
+        self.engine = MockDockerEngine(self.socket_path)
+        self.engine.start()
+        self.streamer = DockerStatsStreamer(self.socket_path)
+
+    def tearDown(self):
+        self.streamer.close()
+        self.engine.stop()
+        self.tmpdir.cleanup()
+
+    def test_read_stats(self):
+        """
+        Test that the latest samples are returned in the /task/stats shape.
+        """
+        stats = self.streamer.read_stats(test_json["task"]["Containers"])
+        self.assertEqual(set(stats), {CONTAINER_A, CONTAINER_B})
+        self.assertEqual(stats[CONTAINER_A]["name"], "containerA")
+        self.assertEqual(stats[CONTAINER_A]["id"], CONTAINER_A)
+        self.assertEqual(
+            stats[CONTAINER_A]["memory_stats"], test_json["stats"][CONTAINER_A]["memory_stats"]
+        )
+
+    def test_stream_is_consumed_not_polled(self):
+        """
+        Test that one long-lived stream per container keeps the samples up to date.
+        """
+        containers = test_json["task"]["Containers"]
+        first = self.streamer.read_stats(containers)
+        time.sleep(0.3)
+        second = self.streamer.read_stats(containers)
+
+        self.assertGreater(
+            second[CONTAINER_A]["cpu_stats"]["cpu_usage"]["total_usage"],
+            first[CONTAINER_A]["cpu_stats"]["cpu_usage"]["total_usage"],
+        )
+        self.assertEqual(sorted(self.engine.stream_requests), [CONTAINER_A, CONTAINER_B])
+
+    def test_removed_container_stream_is_stopped(self):
+        """
+        Test that streams of containers no longer in the task are stopped.
+        """
+        containers = test_json["task"]["Containers"]
+        self.streamer.read_stats(containers)
+        stats = self.streamer.read_stats(containers[:1])
+        self.assertEqual(set(stats), {CONTAINER_A})
+
+        time.sleep(0.3)
+        self.assertIsNone(self.streamer.latest(CONTAINER_B))
+
+    def test_container_without_stream_waits_once(self):
+        """
+        Test that a container without samples, such as a stopped one, delays only the first
+        read, and that its failing stream is warned about once.
+        """
+        self.streamer.close()
+        self.streamer = DockerStatsStreamer(self.socket_path, first_sample_timeout=0.5)
+        containers = test_json["task"]["Containers"] + [{"DockerId": "stopped", "Name": "x"}]
+
+        with self.assertLogs("scripts.docker_engine", "DEBUG") as logs:
+            for _ in range(3):
+                started = time.monotonic()
+                stats = self.streamer.read_stats(containers)
+                elapsed = time.monotonic() - started
+            time.sleep(1.5)
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(set(stats), {CONTAINER_A, CONTAINER_B})
+        failures = [record for record in logs.records if "stopped failed" in record.getMessage()]
+        self.assertGreaterEqual(len(failures), 2)
+        self.assertEqual([record.levelname for record in failures[:2]], ["WARNING", "DEBUG"])
+
+    def test_metrics_from_docker_source(self):
+        """
+        Test that /metrics output is rendered from the docker source.
+        """
+        content = self.collect_metrics()
+        self.assertIn("ecs_metrics_exporter_success 1", content)
+        self.assertRegex(
+            content,
+            r'ee_container_memory_usage_byte{container_id="_task_",[^}]*} 3e\+07',
+        )
+
+    def test_metrics_without_networks(self):
+        """
+        Test that containers without networks statistics, as in the host network mode,
+        report no network traffic.
+        """
+        self.restart_engine(without_networks=[CONTAINER_B])
+        content = self.collect_metrics()
+        self.assertIn("ecs_metrics_exporter_success 1", content)
+        self.assertRegex(
+            content,
+            r'ee_container_network_io_rx_bytes{[^}]*container_name="containerB"[^}]*} 0\.0',
+        )
+        self.assertRegex(
+            content, r'ee_container_network_io_rx_bytes{container_id="_task_",[^}]*} 100\.0'
+        )
+
+    def test_metrics_with_cgroup_v2_block_io(self):
+        """
+        Test the block IO statistics of cgroup v2 hosts, with lowercase ops and without
+        io_serviced_recursive.
+        """
+        self.restart_engine(cgroup_v2=[CONTAINER_A])
+        content = self.collect_metrics()
+        self.assertIn("ecs_metrics_exporter_success 1", content)
+        self.assertRegex(
+            content,
+            r'ee_container_block_io_read_bytes{[^}]*container_name="containerA"[^}]*} 1\.0',
+        )
+        self.assertRegex(
+            content, r'ee_container_block_io_read_bytes{container_id="_task_",[^}]*} 101\.0'
+        )
+        self.assertRegex(
+            content, r'ee_container_block_io_read_ops{container_id="_task_",[^}]*} 0\.0'
+        )
+
+    def restart_engine(self, **options):
+        """
+        Restarts the stand-in engine with other options and opens a new streamer.
+        """
+        self.streamer.close()
+        self.engine.stop()
+        os.unlink(self.socket_path)
+        self.engine = MockDockerEngine(self.socket_path, **options)
+        self.engine.start()
+        self.streamer = DockerStatsStreamer(self.socket_path)
+
+    def collect_metrics(self):
+        """
+        Collects /metrics from the docker source of the stand-in engine.
+        """
+        env = {
+            "ECS_CONTAINER_METADATA_URI_V4": "http://metadata",
+            "ECS_METRICS_EXPORTER_STATS_SOURCE": "docker",
+            "ECS_METRICS_EXPORTER_DOCKER_SOCKET": self.socket_path,
+        }
+        collector.get_counter_offsets.cache_clear()
+        with mock.patch.dict(os.environ, env), mock.patch(
+            "scripts.collector.fetch_json", return_value=test_json["task"]
+        ):
+            content = collector.collect_ecs_task_metadata().decode("utf-8")
+        collector.get_docker_streamer(self.socket_path).close()
+        collector.get_docker_streamer.cache_clear()
+        return content
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+"""
+Unit tests for the exposition format negotiation and the protobuf encoding.
+"""
+
+import os
+import struct
+import unittest
+from unittest import mock
+
+from prometheus_client.core import CollectorRegistry, CounterMetricFamily, GaugeMetricFamily
+
+from scripts import collector
+from scripts.exposition import PROTOBUF_TYPE, generate, negotiate
+from scripts.series_filter import get_series_filter
+from tests.fake_registry import StaticCollector
+from tests.mock_endpoint import fake_fetch_bytes
+
+PROMETHEUS_PROTOBUF_ACCEPT = (
+    "application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;"
+    "encoding=delimited;q=0.7,text/plain;version=0.0.4;q=0.3,*/*;q=0.2"
+)
+PROMETHEUS_OPENMETRICS_ACCEPT = (
+    "application/openmetrics-text;version=1.0.0,application/openmetrics-text;"
+    "version=0.0.1;q=0.75,text/plain;version=0.0.4;q=0.5,*/*;q=0.1"
+)
+
+
+def read_varint(data, position):
+    """
+    Decodes a varint, returning it and the position after it.
+    """
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, position
+
+
+def read_fields(data):
+    """
+    Decodes the fields of a message as a list of (field number, value), with the
+    length-delimited values as bytes and the doubles as floats.
+    """
+    fields = []
+    position = 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        wire_type = key & 7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            (value,), position = struct.unpack_from("<d", data, position), position + 8
+        else:
+            length, position = read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        fields.append((key >> 3, value))
+    return fields
+
+
+def read_families(data):
+    """
+    Decodes delimited MetricFamily messages into dictionaries.
+    """
+    families = []
+    position = 0
+    while position < len(data):
+        length, position = read_varint(data, position)
+        family = {"metrics": []}
+        for number, value in read_fields(data[position:position + length]):
+            if number == 1:
+                family["name"] = value.decode("utf-8")
+            elif number == 2:
+                family["help"] = value.decode("utf-8")
+            elif number == 3:
+                family["type"] = value
+            elif number == 4:
+                family["metrics"].append(read_metric(value))
+        families.append(family)
+        position += length
+    return families
+
+
+def read_metric(data):
+    """
+    Decodes a Metric message into a dictionary.
+    """
+    metric = {"labels": {}}
+    for number, value in read_fields(data):
+        if number == 1:
+            label = dict(read_fields(value))
+            metric["labels"][label[1].decode("utf-8")] = label[2].decode("utf-8")
+        elif number == 6:
+            metric["timestamp_ms"] = value
+        else:
+            fields = dict(read_fields(value))
+            metric["value_field"] = number
+            metric["value"] = fields[1]
+            if 3 in fields:
+                created = dict(read_fields(fields[3]))
+                metric["created"] = created[1] + created.get(2, 0) / 1e9
+    return metric
+
+
+class TestNegotiate(unittest.TestCase):
+    """
+    Test cases for choosing the exposition format from the Accept header.
+    """
+
+    def test_prometheus_accept_headers(self):
+        """
+        Test the Accept headers of Prometheus scrapes.
+        """
+        self.assertEqual(negotiate(PROMETHEUS_PROTOBUF_ACCEPT), "protobuf")
+        self.assertEqual(negotiate(PROMETHEUS_OPENMETRICS_ACCEPT), "openmetrics")
+        self.assertEqual(negotiate("text/plain;version=0.0.4"), "text")
+        self.assertEqual(negotiate(None), "text")
+
+    def test_qualities(self):
+        """
+        Test that the format with the highest q-value wins and that protobuf needs the
+        delimited MetricFamily encoding.
+        """
+        self.assertEqual(negotiate(
+            "application/openmetrics-text;q=0.8,application/vnd.google.protobuf;"
+            "proto=io.prometheus.client.MetricFamily;encoding=delimited;q=0.5"
+        ), "openmetrics")
+        self.assertEqual(negotiate("application/vnd.google.protobuf;encoding=text"), "text")
+        self.assertEqual(negotiate("application/openmetrics-text;q=0"), "text")
+        self.assertEqual(negotiate("application/openmetrics-text;q=x"), "text")
+
+    def test_text_quality(self):
+        """
+        Test that text/plain and */* compete with their own q-values.
+        """
+        self.assertEqual(
+            negotiate("text/plain;q=1,application/openmetrics-text;q=0.5"), "text"
+        )
+        self.assertEqual(negotiate("*/*,application/openmetrics-text;q=0.9"), "text")
+        self.assertEqual(
+            negotiate("text/plain;q=0.4,application/openmetrics-text;q=0.5"), "openmetrics"
+        )
+
+
+class TestProtobuf(unittest.TestCase):
+    """
+    Test cases for the protobuf encoding of registries.
+    """
+
+    def test_families(self):
+        """
+        Test counters with created timestamps, gauges with sample timestamps and labels.
+        """
+        registry = CollectorRegistry(auto_describe=False)
+        counter = CounterMetricFamily("ee_cpu", "CPU usage", labels=["name"])
+        counter.add_metric(["a"], 3.25, created=12.5, timestamp=1609556675.883)
+        gauge = GaugeMetricFamily("ee_memory", "Memory usage", labels=["name", "id"])
+        gauge.add_metric(["b", "x"], 2**40)
+        gauge.add_metric(["c", "y"], -1.5)
+        registry.register(StaticCollector([counter, gauge]))
+
+        content, content_type = generate(registry, "protobuf")
+        self.assertEqual(content_type, PROTOBUF_TYPE)
+        families = read_families(content)
+        self.assertEqual(len(families), 2)
+        cpu, memory = families  # pylint: disable=unbalanced-tuple-unpacking
+
+        self.assertEqual((cpu["name"], cpu["help"], cpu["type"]), ("ee_cpu_total", "CPU usage", 0))
+        self.assertEqual(cpu["metrics"], [{
+            "labels": {"name": "a"},
+            "value_field": 3,
+            "value": 3.25,
+            "created": 12.5,
+            "timestamp_ms": 1609556675883,
+        }])
+        self.assertEqual((memory["name"], memory["type"]), ("ee_memory", 1))
+        self.assertEqual(memory["metrics"], [
+            {"labels": {"name": "b", "id": "x"}, "value_field": 2, "value": 2**40},
+            {"labels": {"name": "c", "id": "y"}, "value_field": 2, "value": -1.5},
+        ])
+
+    def test_collected_registry(self):
+        """
+        Test that every collected family is encoded.
+        """
+        collector.get_counter_offsets.cache_clear()
+        with mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes):
+            content, content_type = collector.render_metrics(PROMETHEUS_PROTOBUF_ACCEPT)
+        self.assertEqual(content_type, PROTOBUF_TYPE)
+        families = {family["name"]: family for family in read_families(content)}
+        self.assertEqual(families["ecs_metrics_exporter_success"]["metrics"][0]["value"], 1)
+        self.assertIn("ee_container_cpu_usage_seconds_total", families)
+        self.assertNotIn(
+            "created", families["ee_container_cpu_usage_seconds_total"]["metrics"][0]
+        )
+        self.assertEqual(
+            {metric["labels"]["container_name"]
+             for metric in families["ee_container_memory_usage_byte"]["metrics"]},
+            {"containerA", "containerB", "_task_"},
+        )
+
+
+class TestRenderMetrics(unittest.TestCase):
+    """
+    Test cases for rendering the collected metrics in the negotiated format.
+    """
+
+    def setUp(self):
+        collector.get_counter_offsets.cache_clear()
+        patcher = mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(collector.get_counter_offsets.cache_clear)
+
+    def test_openmetrics(self):
+        """
+        Test the OpenMetrics format and its series selection.
+        """
+        content, content_type = collector.render_metrics(
+            PROMETHEUS_OPENMETRICS_ACCEPT,
+            get_series_filter(containers=("containerB",)),
+        )
+        self.assertTrue(content_type.startswith("application/openmetrics-text"))
+        content = content.decode("utf-8")
+        self.assertTrue(content.endswith("# EOF\n"))
+        self.assertIn('container_name="containerB"', content)
+        self.assertNotIn('container_name="containerA"', content)
+        self.assertNotIn("_created", content)
+
+    def test_sample_timestamps(self):
+        """
+        Test that statistics samples are timestamped with their read time when enabled.
+        """
+        content, _ = collector.render_metrics()
+        self.assertNotIn(b"1609556675", content)
+
+        with mock.patch.dict(os.environ, {collector.SAMPLE_TIMESTAMPS_ENV: "true"}):
+            content, _ = collector.render_metrics(PROMETHEUS_OPENMETRICS_ACCEPT)
+        lines = content.decode("utf-8").splitlines()
+        memory = [line for line in lines if line.startswith("ee_container_memory_usage_byte{")]
+        self.assertEqual(
+            [line.rsplit(" ", 1)[1] for line in memory],
+            [
+                "1609556675.883623",
+                "1609556678.594139",
+                "1609556678.594139",
+            ],
+        )
+        self.assertFalse(any(
+            line.startswith("ee_task_cpu_limit{") and line.count(" ") > 1 for line in lines
+        ))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""
+Unit tests for the minimal-footprint server mode.
+"""
+
+import asyncio
+import http.client
+import json
+import subprocess
+import sys
+import threading
+import unittest
+import urllib.error
+from unittest import mock
+
+from scripts import collector, lean_server
+from scripts.exposition import PROTOBUF_TYPE
+from tests.mock_endpoint import test_json
+
+
+def fake_fetch_json(url, _):
+    """
+    Returns the mock endpoint documents instead of fetching them.
+    """
+    return test_json["stats"] if url.endswith("/task/stats") else test_json["task"]
+
+
+class TestLeanServer(unittest.TestCase):
+    """
+    Test cases for the lean server endpoints.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Start the lean server on an ephemeral port in a background event loop.
+        """
+        cls.patcher = mock.patch("scripts.collector.fetch_json", side_effect=fake_fetch_json)
+        cls.patcher.start()
+        cls.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def on_started(server):
+            cls.port = server.sockets[0].getsockname()[1]
+            started.set()
+
+        cls.task = cls.loop.create_task(lean_server.serve("127.0.0.1", 0, on_started))
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        started.wait(5)
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Stop the server loop.
+        """
+        cls.loop.call_soon_threadsafe(cls.task.cancel)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.patcher.stop()
+
+    def request(self, method, path, conn=None, headers=None):
+        """
+        Sends a request and returns the response with its body read.
+        """
+        conn = conn or http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+
+    def test_metrics_endpoint(self):
+        """
+        Test the /metrics endpoint.
+        """
+        response, body = self.request("GET", "/metrics")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "text/plain; charset=utf-8")
+        self.assertIn("ecs_metrics_exporter_success 1", body.decode("utf-8"))
+        self.assertRegex(body.decode("utf-8"), r'ee_task_cpu_limit{[^}]*} 0\.5')
+
+        self.assertIsNone(response.getheader("X-Metrics-Generation"))
+
+        response, body = self.request("GET", "/metrics/delta")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("X-Metrics-Delta"), "full")
+        token = response.getheader("X-Metrics-Generation")
+        response, body = self.request("GET", f"/metrics/delta?since={token}")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("X-Metrics-Delta"), "delta")
+        self.assertNotIn("ee_task_cpu_limit", body.decode("utf-8"))
+
+    def test_metrics_selectors(self):
+        """
+        Test the /metrics endpoint with series selectors.
+        """
+        response, body = self.request(
+            "GET", "/metrics?container=containerA&name%5B%5D=ee_container_memory_usage_byte"
+        )
+        self.assertEqual(response.status, 200)
+        samples = [line for line in body.decode("utf-8").splitlines() if not line.startswith("#")]
+        self.assertEqual(len(samples), 1)
+        self.assertRegex(
+            samples[0], r'^ee_container_memory_usage_byte{.*container_name="containerA"'
+        )
+
+        response, body = self.request("GET", "/metrics?match%5B%5D=%7Ba%3D%7D")
+        self.assertEqual(response.status, 400)
+        self.assertIn("Invalid series selector", json.loads(body)["detail"])
+
+    def test_metrics_content_negotiation(self):
+        """
+        Test the /metrics formats chosen by the Accept header.
+        """
+        response, body = self.request(
+            "GET", "/metrics", headers={"Accept": "application/openmetrics-text;version=1.0.0"}
+        )
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith(
+            "application/openmetrics-text"
+        ))
+        self.assertTrue(body.endswith(b"# EOF\n"))
+        self.assertIsNone(response.getheader("X-Metrics-Generation"))
+
+        response, body = self.request("GET", "/metrics", headers={"Accept": (
+            "application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;"
+            "encoding=delimited;q=0.7,text/plain;version=0.0.4;q=0.3"
+        )})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), PROTOBUF_TYPE)
+        self.assertIn(b"ecs_metrics_exporter_success", body)
+
+    def test_stats_and_task_endpoints(self):
+        """
+        Test the /stats and /task endpoints over one keep-alive connection.
+        """
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        response, body = self.request("GET", "/stats", conn)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body), test_json["stats"])
+        response, body = self.request("GET", "/task", conn)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body), test_json["task"])
+        conn.close()
+
+    def test_errors(self):
+        """
+        Test unknown paths and methods.
+        """
+        response, body = self.request("GET", "/unknown")
+        self.assertEqual(response.status, 404)
+        self.assertEqual(json.loads(body), {"detail": "Not Found"})
+        response, _ = self.request("POST", "/metrics")
+        self.assertEqual(response.status, 405)
+
+    def test_no_framework_imports(self):
+        """
+        Test that the lean server does not import the FastAPI stack.
+        """
+        code = (
+            "import sys, scripts.lean_server; "
+            "print(','.join(m for m in ('fastapi', 'pydantic', 'starlette', 'uvicorn', "
+            "'requests', 'dateutil') if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, check=True, text=True
+        ).stdout
+        self.assertEqual(output.strip(), "")
+
+
+
+class TestFetchErrors(unittest.TestCase):
+    """
+    Test cases for metadata endpoint responses that cannot be used.
+    """
+
+    def setUp(self):
+        collector.get_counter_offsets.cache_clear()
+        self.addCleanup(collector.get_counter_offsets.cache_clear)
+
+    def assert_failed_collection(self):
+        """
+        Checks that a collection logs the failure and exports an unsuccessful collection.
+        """
+        with self.assertLogs("scripts.collector", "ERROR"):
+            content = collector.collect_ecs_task_metadata().decode("utf-8")
+        self.assertIn("ecs_metrics_exporter_success 0", content)
+
+    def test_non_json_body(self):
+        """
+        Test that a body that is not JSON, such as a proxy error page, fails the collection.
+        """
+        with mock.patch.object(
+            collector, "fetch_bytes", return_value=b"<html>502 Bad Gateway</html>"
+        ):
+            self.assert_failed_collection()
+
+        with mock.patch.object(collector.urllib.request, "urlopen") as urlopen:
+            urlopen.return_value.__enter__.return_value.read.return_value = b"<html>"
+            with self.assertRaises(urllib.error.URLError):
+                collector.fetch_json("http://metadata/task", "task metadata")
+
+    def test_incomplete_body(self):
+        """
+        Test that a body cut off by the endpoint fails the collection.
+        """
+        with mock.patch.object(collector.urllib.request, "urlopen") as urlopen:
+            urlopen.return_value.__enter__.return_value.read.side_effect = (
+                http.client.IncompleteRead(b"{")
+            )
+            self.assert_failed_collection()
+
+if __name__ == "__main__":
+    unittest.main()
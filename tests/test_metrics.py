@@ -56,6 +56,7 @@ class TestMetricsEndpoint(unittest.TestCase):
         content = response.content.decode("utf-8")
 
         self.assertIn("ecs_metrics_exporter_success 1", content)
+        self.assertRegex(content, r'ecs_metrics_exporter_cpu_seconds_total{mode="user"} \d')
 
         patterns = [
             (r'ee_task_cpu_limit{[^}]*task_family="taskdef-name-test",'
@@ -70,6 +71,70 @@ class TestMetricsEndpoint(unittest.TestCase):
         for pattern in patterns:
             self.assertRegex(content, pattern)
 
+    def test_metrics_delta_endpoint(self):
+        """
+        Test the /metrics/delta endpoint.
+        """
+        response = self.client.get("/metrics/delta")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ee_task_cpu_limit", response.content.decode("utf-8"))
+        self.assertEqual(response.headers["X-Metrics-Delta"], "full")
+        token = response.headers["X-Metrics-Generation"]
+
+        response = self.client.get("/metrics/delta", params={"since": token})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode("utf-8")
+        self.assertNotIn("ee_task_cpu_limit", content)
+        self.assertEqual(response.headers["X-Metrics-Delta"], "delta")
+        self.assertNotIn("_created", content)
+
+        response = self.client.get("/metrics/delta", params={"since": "expired-1"})
+        self.assertIn("ee_task_cpu_limit", response.content.decode("utf-8"))
+        self.assertEqual(response.headers["X-Metrics-Delta"], "full")
+
+    def test_metrics_selectors(self):
+        """
+        Test the /metrics endpoint with name[], match[] and container parameters.
+        """
+        response = self.client.get(
+            "/metrics",
+            params={
+                "match[]": ['{__name__=~"ee_task_.*_limit.*"}'],
+                "name[]": ["ee_task_pull_started_at_time"],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        names = {
+            line.split("{")[0]
+            for line in response.content.decode("utf-8").splitlines()
+            if not line.startswith("#")
+        }
+        self.assertEqual(
+            names,
+            {"ee_task_cpu_limit", "ee_task_memory_limit_byte", "ee_task_pull_started_at_time"},
+        )
+
+        response = self.client.get("/metrics", params={"container": "containerB"})
+        content = response.content.decode("utf-8")
+        self.assertIn('container_name="containerB"', content)
+        self.assertNotIn('container_name="containerA"', content)
+
+        response = self.client.get("/metrics", params={"match[]": "ee_task_cpu_limit{"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_metrics_content_negotiation(self):
+        """
+        Test the /metrics endpoint in the OpenMetrics format.
+        """
+        response = self.client.get(
+            "/metrics", headers={"Accept": "application/openmetrics-text;version=1.0.0"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response.headers["Content-Type"].startswith("application/openmetrics-text")
+        )
+        self.assertTrue(response.content.endswith(b"# EOF\n"))
+
     def test_stats_endpoint(self):
         """
         Test the /stats endpoint.
@@ -0,0 +1,194 @@
+"""
+Unit tests for the shared memory snapshot and the multi-process serving mode.
+"""
+
+import http.client
+import json
+import os
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from scripts import collector, multi_worker
+from scripts.shared_snapshot import (
+    SharedSnapshotReader,
+    SharedSnapshotWriter,
+    SnapshotTooLarge,
+)
+from tests.mock_endpoint import fake_fetch_bytes, test_json
+
+
+class TestSharedSnapshot(unittest.TestCase):
+    """
+    Test cases for publishing and reading snapshots.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "snapshot")
+        self.writer = SharedSnapshotWriter(self.path, 4096)
+        self.reader = SharedSnapshotReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+        self.tmpdir.cleanup()
+
+    def test_read_before_first_write(self):
+        """
+        Test that a reader sees generation 0 and no payloads before the first write.
+        """
+        self.assertEqual(self.reader.read(), (0, ()))
+
+    def test_generations(self):
+        """
+        Test that every write is read back with a new generation.
+        """
+        for i in range(1, 5):
+            payloads = (f"metrics {i}".encode(), b"", b"{}")
+            self.assertEqual(self.writer.write(*payloads), i)
+            self.assertEqual(self.reader.read(), (i, payloads))
+
+    def test_unchanged_generation_is_not_copied(self):
+        """
+        Test that the payloads are copied once per generation.
+        """
+        self.writer.write(b"metrics")
+        _, first = self.reader.read()
+        _, second = self.reader.read()
+        self.assertIs(first, second)
+
+    def test_too_large(self):
+        """
+        Test that a snapshot larger than a slot is rejected and the previous one kept.
+        """
+        self.writer.write(b"metrics")
+        with self.assertRaises(SnapshotTooLarge):
+            self.writer.write(b"x" * 4096)
+        self.assertEqual(self.reader.read(), (1, (b"metrics",)))
+
+
+class TestScrapeReports(unittest.TestCase):
+    """
+    Test cases for reporting the scrapes of the workers.
+    """
+
+    def test_metrics_scrapes_reported(self):
+        """
+        Test that /metrics scrapes are reported and other requests are not.
+        """
+        reader = mock.Mock()
+        reader.read.return_value = (1, (b"metrics\n", b"{}", b"{}"))
+        scrapes = []
+        routes = multi_worker.snapshot_routes(reader, lambda: scrapes.append(True))
+
+        self.assertEqual(routes["/metrics"]({}, {})[2], b"metrics\n")
+        routes["/stats"]({}, {})
+        self.assertEqual(routes["/metrics"]({"container": ["app"]}, {})[0], 400)
+        self.assertEqual(scrapes, [True])
+
+
+class TestMultiWorker(unittest.TestCase):
+    """
+    Test cases for serving the snapshot from several worker processes.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = os.path.join(self.tmpdir.name, "snapshot")
+        self.writer = SharedSnapshotWriter(self.path, 1024 * 1024)
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        self.sock.close()
+        self.writer.close()
+        self.tmpdir.cleanup()
+
+    def request(self, path):
+        """
+        Sends a GET request to the workers and returns the response with its body read.
+        """
+        deadline = time.monotonic() + 5
+        while True:
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                return response, response.read()
+            except ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+            finally:
+                conn.close()
+
+    def test_collect_snapshot(self):
+        """
+        Test that one collection renders the metrics and the raw JSON documents.
+        """
+        with mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes):
+            metrics_data, stats, task = multi_worker.collect_snapshot()
+        self.assertIn("ecs_metrics_exporter_success 1", metrics_data.decode("utf-8"))
+        self.assertEqual(json.loads(stats), test_json["stats"])
+        self.assertEqual(json.loads(task), test_json["task"])
+
+        with mock.patch.object(collector, "fetch_bytes", side_effect=OSError("down")):
+            metrics_data, stats, task = multi_worker.collect_snapshot()
+        self.assertIn("ecs_metrics_exporter_success 0", metrics_data.decode("utf-8"))
+        self.assertEqual((stats, task), (b"", b""))
+
+    def test_publish_returns_sample_values(self):
+        """
+        Test that a published collection returns the values of its change detection.
+        """
+        with mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes):
+            values = multi_worker.publish(self.writer)
+        self.assertEqual(values[("ee_task_cpu_limit", (
+            ("container_id", "_task_"),
+            ("container_name", "_task_"),
+            ("task_family", "taskdef-name-test"),
+            ("task_revision", "123"),
+        ))], 0.5)
+        reader = SharedSnapshotReader(self.path)
+        self.assertEqual(reader.read()[0], 1)
+        reader.close()
+
+        with mock.patch.object(
+            multi_worker, "collect_snapshot", return_value=(b"x" * 2**21, b"", b"")
+        ):
+            self.assertIsNone(multi_worker.publish(self.writer))
+
+    def test_workers_serve_latest_snapshot(self):
+        """
+        Test that the workers serve each published snapshot without fetching.
+        """
+        self.writer.write(b"generation 1\n", b"", b'{"Family": "family"}')
+        self.workers = multi_worker.start_workers(self.sock, self.path, 2)
+
+        for _ in range(4):
+            response, body = self.request("/metrics")
+            self.assertEqual(response.status, 200)
+            self.assertEqual(body, b"generation 1\n")
+        response, body = self.request("/task")
+        self.assertEqual(response.getheader("Content-Type"), "application/json")
+        self.assertEqual(json.loads(body), {"Family": "family"})
+        response, _ = self.request("/stats")
+        self.assertEqual(response.status, 500)
+        response, _ = self.request("/metrics/delta")
+        self.assertEqual(response.status, 404)
+
+        self.writer.write(b"generation 2\n", b"{}", b"{}")
+        for _ in range(4):
+            _, body = self.request("/metrics")
+            self.assertEqual(body, b"generation 2\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
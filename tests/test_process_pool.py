@@ -0,0 +1,82 @@
+"""
+Unit tests for decoding and computing the metrics on a process pool.
+"""
+
+import os
+import re
+import unittest
+from unittest import mock
+
+from prometheus_client import generate_latest
+
+from scripts import collector
+from tests.mock_endpoint import fake_fetch_bytes, test_json
+
+VOLATILE_SAMPLE = re.compile(
+    rb"^(\w+_created|ecs_metrics_exporter_cpu_seconds_total)\{.*\n", re.MULTILINE
+)
+
+
+def render():
+    """
+    Collects once and renders the metrics without the wall clock _created samples and the
+    CPU time of the exporter.
+    """
+    collector.get_counter_offsets.cache_clear()
+    content = generate_latest(collector.collect_ecs_task_registry())
+    collector.get_counter_offsets.cache_clear()
+    return VOLATILE_SAMPLE.sub(b"", content)
+
+
+class TestProcessPool(unittest.TestCase):
+    """
+    Test cases for the process pool stage of a collection.
+    """
+
+    def test_summarize_task_decodes_bytes(self):
+        """
+        Test that JSON bytes and decoded documents give the same summary.
+        """
+        self.assertEqual(
+            collector.summarize_task(
+                fake_fetch_bytes("/task", None), fake_fetch_bytes("/task/stats", None)
+            ),
+            collector.summarize_task(test_json["task"], test_json["stats"]),
+        )
+
+    def test_block_io_sums_every_device(self):
+        """
+        Test that the gauges keep the last device while the sums add all of them.
+        """
+        summary = collector.summarize_task(test_json["task"], test_json["stats"])
+        containers = summary["containers"]
+        self.assertEqual(containers[0]["gauges"]["gauge_block_io_read_bytes"], 1)
+        self.assertEqual(
+            summary["sums"]["gauge_block_io_read_bytes"],
+            sum(
+                blk_io["value"]
+                for stat in test_json["stats"].values()
+                for blk_io in stat["blkio_stats"]["io_service_bytes_recursive"]
+                if blk_io["op"] == "Read"
+            ),
+        )
+
+    def test_pool_matches_inline(self):
+        """
+        Test that a collection on the process pool renders the same metrics.
+        """
+        with mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes):
+            inline = render()
+            with mock.patch.dict(os.environ, {collector.PROCESS_POOL_SIZE_ENV: "2"}):
+                try:
+                    pooled = render()
+                finally:
+                    collector.get_process_pool(2).shutdown()
+                    collector.get_process_pool.cache_clear()
+
+        self.assertIn(b"ecs_metrics_exporter_success 1", pooled)
+        self.assertEqual(pooled, inline)
+
+
+if __name__ == "__main__":
+    unittest.main()
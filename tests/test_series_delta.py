@@ -0,0 +1,126 @@
+"""
+Unit tests for series level change detection.
+"""
+
+import unittest
+from unittest import mock
+
+from prometheus_client import generate_latest
+
+from scripts import collector
+from scripts.series_delta import SeriesTracker
+from tests.fake_registry import TASK_LABELS, build_registry
+from tests.mock_endpoint import fake_fetch_bytes
+
+
+class TestSeriesTracker(unittest.TestCase):
+    """
+    Test cases for full and delta rendering.
+    """
+
+    def test_full_render_matches_generate_latest(self):
+        """
+        Test that the full rendering is identical to prometheus_client.
+        """
+        tracker = SeriesTracker()
+        for memory_bytes in (100, 100, 200):
+            registry = build_registry(memory_bytes)
+            content, _ = tracker.snapshot(registry)
+            self.assertEqual(content, generate_latest(registry))
+
+    def test_unchanged_fragments_are_reused(self):
+        """
+        Test that the rendered text of unchanged series is reused.
+        """
+        tracker = SeriesTracker()
+        tracker.snapshot(build_registry(100))
+        key = ("ee_task_cpu_limit", tuple(sorted(TASK_LABELS.items())))
+        fragment = tracker._fragments[key]  # pylint: disable=protected-access
+        tracker.snapshot(build_registry(200))
+        self.assertIs(tracker._fragments[key], fragment)  # pylint: disable=protected-access
+
+    def test_delta_since_token(self):
+        """
+        Test that only changed series are rendered after a valid token.
+        """
+        tracker = SeriesTracker()
+        _, token = tracker.snapshot(build_registry(100, containers=("app", "sidecar")))
+        content, next_token = tracker.snapshot(build_registry(200), since=token)
+        content = content.decode("utf-8")
+
+        self.assertNotEqual(token, next_token)
+        self.assertIn("# TYPE ee_container_memory_usage_byte gauge\n", content)
+        self.assertIn('container_name="app"', content)
+        self.assertNotIn("ee_task_cpu_limit", content)
+        self.assertNotIn("ee_container_network_io_rx_bytes", content)
+        self.assertIn(
+            '# REMOVED ee_container_memory_usage_byte{container_id="0123456789ab",'
+            'container_name="sidecar",task_family="family",task_revision="1"}\n',
+            content,
+        )
+
+    def test_unchanged_snapshot_keeps_generation(self):
+        """
+        Test that a snapshot without changes keeps the token and renders nothing.
+        """
+        tracker = SeriesTracker()
+        registry = build_registry(100)
+        _, token = tracker.snapshot(registry)
+        content, next_token = tracker.snapshot(registry, since=token)
+        self.assertEqual(content, b"")
+        self.assertEqual(token, next_token)
+
+    def test_unknown_token_gets_full_snapshot(self):
+        """
+        Test that tokens of another instance or garbage get the full snapshot.
+        """
+        tracker = SeriesTracker()
+        _, token = tracker.snapshot(build_registry(100))
+        registry = build_registry(100)
+        for since in ("", "garbage", "0000-1", token + "0"):
+            content, _, delta = SeriesTracker().delta(registry, since)
+            self.assertEqual(content, generate_latest(registry))
+            self.assertFalse(delta)
+
+    def test_delta_tells_whether_token_honoured(self):
+        """
+        Test that delta() tells a rendering of the changed series from a full one.
+        """
+        tracker = SeriesTracker()
+        _, token, delta = tracker.delta(build_registry(100), None)
+        self.assertFalse(delta)
+        content, _, delta = tracker.delta(build_registry(200), token)
+        self.assertTrue(delta)
+        self.assertNotIn(b"ee_task_cpu_limit", content)
+
+
+
+class TestRenderDelta(unittest.TestCase):
+    """
+    Test cases for the deltas of successive collections.
+    """
+
+    def test_unchanged_collection_gives_empty_delta(self):
+        """
+        Test that a collection of unchanged statistics only renders the CPU time of the
+        exporter, which is the only value that changes.
+        """
+        collector.get_counter_offsets.cache_clear()
+        self.addCleanup(collector.get_counter_offsets.cache_clear)
+        with mock.patch.object(collector, "fetch_bytes", side_effect=fake_fetch_bytes):
+            content, token, delta = collector.render_delta(None)
+            self.assertFalse(delta)
+            self.assertIn(b"ee_container_cpu_usage_seconds_total{", content)
+            self.assertNotIn(b"_created", content)
+
+            content, _, delta = collector.render_delta(token)
+        self.assertTrue(delta)
+        samples = [
+            line for line in content.decode("utf-8").splitlines() if not line.startswith("#")
+        ]
+        self.assertEqual(
+            [line for line in samples if not line.startswith("ecs_metrics_exporter_cpu_")], []
+        )
+
+if __name__ == "__main__":
+    unittest.main()
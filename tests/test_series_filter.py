@@ -0,0 +1,137 @@
+"""
+Unit tests for the federate-style series selection.
+"""
+
+import unittest
+
+from scripts.series_delta import SeriesTracker
+from scripts.series_filter import SeriesFilter, get_series_filter, parse_selector
+from tests.fake_registry import build_registry
+
+
+class TestParseSelector(unittest.TestCase):
+    """
+    Test cases for parsing series selectors.
+    """
+
+    def test_valid_selectors(self):
+        """
+        Test metric names, label matchers and quoting.
+        """
+        self.assertEqual(
+            parse_selector("ee_task_cpu_limit"), (("__name__", "=", "ee_task_cpu_limit"),)
+        )
+        matchers = parse_selector(
+            ' ee_container_memory_usage_byte { container_name = "a\\"b", task_family!=\'f\', } '
+        )
+        self.assertEqual(matchers, (
+            ("__name__", "=", "ee_container_memory_usage_byte"),
+            ("container_name", "=", 'a"b'),
+            ("task_family", "!=", "f"),
+        ))
+        label, operator, pattern = parse_selector('{__name__=~"ee_task_.*"}')[0]
+        self.assertEqual((label, operator, pattern.pattern), ("__name__", "=~", "ee_task_.*"))
+
+    def test_invalid_selectors(self):
+        """
+        Test that invalid selectors raise ValueError.
+        """
+        for selector in ("", "{}", "name{", 'name{a="b"', 'name{a~"b"}', '{a=~"("}', "a b"):
+            with self.subTest(selector=selector), self.assertRaises(ValueError):
+                parse_selector(selector)
+
+
+class TestSeriesFilter(unittest.TestCase):
+    """
+    Test cases for selecting series.
+    """
+
+    def test_selects(self):
+        """
+        Test names and selectors as a union restricted by containers.
+        """
+        labels = (("container_name", "app"), ("task_family", "family"))
+        series_filter = SeriesFilter(
+            names=["ee_task_cpu_limit"], selectors=['{__name__=~"ee_container_.*_bytes"}']
+        )
+        self.assertTrue(series_filter.selects("ee_task_cpu_limit", "ee_task_cpu_limit", ()))
+        self.assertTrue(series_filter.selects(
+            "ee_container_network_io_rx_bytes", "ee_container_network_io_rx_bytes", labels
+        ))
+        self.assertFalse(series_filter.selects(
+            "ee_container_memory_usage_byte", "ee_container_memory_usage_byte", labels
+        ))
+
+        series_filter = SeriesFilter(selectors=['x{missing=""}'], containers=["app"])
+        self.assertTrue(series_filter.selects("x", "x", labels))
+        self.assertFalse(series_filter.selects("x", "x", (("container_name", "other"),)))
+        self.assertTrue(SeriesFilter(containers=["app"]).selects("y", "y", labels))
+
+    def test_no_parameters(self):
+        """
+        Test that no parameters select everything without a filter.
+        """
+        self.assertIsNone(get_series_filter())
+
+
+class TestFilteredSnapshot(unittest.TestCase):
+    """
+    Test cases for rendering and caching filtered snapshots.
+    """
+
+    def test_filtered_render(self):
+        """
+        Test that a filtered snapshot renders the selected series of the full snapshot.
+        """
+        tracker = SeriesTracker()
+        registry = build_registry(100, containers=("app", "sidecar"))
+        full, _ = tracker.snapshot(registry)
+        content, _ = tracker.snapshot(
+            registry, series_filter=SeriesFilter(containers=["sidecar"])
+        )
+        content = content.decode("utf-8")
+        selected = [
+            line for line in full.decode("utf-8").splitlines(keepends=True)
+            if 'container_name="sidecar"' in line
+        ]
+        self.assertEqual([line for line in content.splitlines(keepends=True)
+                          if not line.startswith("#")], selected)
+        self.assertIn("# TYPE ee_container_memory_usage_byte gauge\n", content)
+        self.assertNotIn("ee_task_cpu_limit", content)
+
+    def test_render_cache(self):
+        """
+        Test that a selection is rendered again only when its series change.
+        """
+        tracker = SeriesTracker()
+        task_filter = SeriesFilter(selectors=["ee_task_cpu_limit"])
+        memory_filter = SeriesFilter(names=["ee_container_memory_usage_byte"])
+        first, _ = tracker.snapshot(build_registry(100), series_filter=task_filter)
+        tracker.snapshot(build_registry(100), series_filter=memory_filter)
+
+        second, _ = tracker.snapshot(build_registry(200), series_filter=task_filter)
+        self.assertIs(second, first)
+        memory, _ = tracker.snapshot(build_registry(300), series_filter=memory_filter)
+        self.assertIn(b" 300.0\n", memory)
+
+        content, _ = tracker.snapshot(
+            build_registry(300, containers=("app", "sidecar")), series_filter=memory_filter
+        )
+        self.assertIn(b'container_name="sidecar"', content)
+
+    def test_filtered_delta(self):
+        """
+        Test that a delta is restricted to the selected series and removals.
+        """
+        tracker = SeriesTracker()
+        sidecar_filter = SeriesFilter(containers=["sidecar"])
+        _, token = tracker.snapshot(build_registry(100, containers=("app", "sidecar")))
+        content, _ = tracker.snapshot(build_registry(200), token, sidecar_filter)
+        content = content.decode("utf-8")
+        self.assertNotIn('container_name="app"} 200.0', content)
+        self.assertIn('# REMOVED ee_container_memory_usage_byte{container_id="0123456789ab",'
+                      'container_name="sidecar"', content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Unit tests for the live stats fan-out.
+"""
+
+import asyncio
+import json
+import unittest
+
+from scripts.stats_broadcast import StatsBroadcaster, frame_ndjson, frame_sse
+
+
+class CountingFetch:  # pylint: disable=too-few-public-methods
+    """
+    A fetch function returning an increasing sample number.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"sample": self.calls}
+
+
+class TestStatsBroadcaster(unittest.TestCase):
+    """
+    Test cases for the single poller fan-out.
+    """
+
+    def test_one_fetch_per_sample_for_all_subscribers(self):
+        """
+        Test that every subscriber gets each sample while it is fetched only once.
+        """
+        fetch = CountingFetch()
+        broadcaster = StatsBroadcaster(fetch, interval=0.01, queue_size=16)
+
+        async def consume(count):
+            received = []
+            stream = broadcaster.stream(frame_ndjson)
+            async for line in stream:
+                received.append(json.loads(line)["sample"])
+                if len(received) == count:
+                    break
+            await stream.aclose()
+            return received
+
+        async def run():
+            return await asyncio.gather(*(consume(5) for _ in range(10)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, [[1, 2, 3, 4, 5]] * 10)
+        self.assertLessEqual(fetch.calls, 6)
+        self.assertEqual(broadcaster.subscriber_count, 0)
+
+    def test_slow_subscriber_drops_oldest(self):
+        """
+        Test that a full subscriber queue keeps the newest samples.
+        """
+        broadcaster = StatsBroadcaster(CountingFetch(), queue_size=2)
+
+        async def run():
+            subscriber = asyncio.Queue(maxsize=broadcaster.queue_size)
+            broadcaster._subscribers.add(subscriber)  # pylint: disable=protected-access
+            for i in range(5):
+                broadcaster.publish(str(i).encode("ascii"))
+            return [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+
+        self.assertEqual(asyncio.run(run()), [b"3", b"4"])
+        self.assertEqual(broadcaster.dropped, 3)
+
+    def test_poller_survives_failures(self):
+        """
+        Test that a failing fetch, whatever the error, is retried at the next interval.
+        """
+        fetch = CountingFetch()
+        errors = [ValueError("bad JSON"), KeyError("networks"), OSError("down")]
+
+        def flaky_fetch():
+            if errors:
+                raise errors.pop(0)
+            return fetch()
+
+        broadcaster = StatsBroadcaster(flaky_fetch, interval=0.01)
+
+        async def run():
+            stream = broadcaster.stream(frame_ndjson)
+            line = await asyncio.wait_for(anext(stream), 5)
+            await stream.aclose()
+            return json.loads(line)
+
+        with self.assertLogs("scripts.stats_broadcast", "ERROR") as logs:
+            self.assertEqual(asyncio.run(run()), {"sample": 1})
+        self.assertEqual(len(logs.records), 3)
+
+    def test_poller_stops_without_subscribers(self):
+        """
+        Test that no fetch happens after the last subscriber leaves.
+        """
+        fetch = CountingFetch()
+        broadcaster = StatsBroadcaster(fetch, interval=0.01)
+
+        async def run():
+            stream = broadcaster.stream(frame_sse)
+            first = await anext(stream)
+            await stream.aclose()
+            await asyncio.sleep(0.05)
+            return first
+
+        self.assertEqual(asyncio.run(run()), b'data: {"sample": 1}\n\n')
+        self.assertLessEqual(fetch.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()